@@ -0,0 +1,453 @@
+import os
+import re
+import glob
+import itertools
+import argparse
+import time
+import multiprocessing
+from datetime import datetime
+
+import sudoku_solver
+import puzzle_format
+import vectorized_propagation
+
+
+# Largest number of puzzles sent to a worker at once when the chunk size is picked from the batch size.
+# The start of a streamed batch is read ahead up to this many chunks of every worker to find its size, so a small
+# stream is spread over every worker and only a large one (a compact file of many puzzles) gets chunks this big
+STREAM_CHUNKSIZE = 64
+
+# Number of chunks of every worker when the chunk size is picked from the batch size
+CHUNKS_PER_WORKER = 4
+
+# Number of puzzles read and propagated together by the vectorized front-end
+VECTORIZED_BATCH_SIZE = 10000
+
+
+def split_puzzles(content):
+    """
+    Split the text of a multi-puzzle file into the text of every puzzle
+    :param content: puzzles in the input format, one after the other
+    :return: list with the text of every puzzle (board, horizontal dots and vertical dots blocks)
+    """
+    blocks = [block.strip("\n") for block in re.split(r"\n[ \t]*\n", content) if block.strip()]
+    return ["\n\n".join(blocks[start:start + 3]) for start in range(0, len(blocks), 3)]
+
+
+def is_compact_file(path):
+    """
+    :return: whether the first puzzle line of a file is in the compact format
+    """
+    with open(path, "r") as file:
+        for line in file:
+            if line.strip() and not line.startswith("#"):
+                return puzzle_format.is_compact(line)
+    return False
+
+
+def iter_puzzles(source):
+    """
+    Stream the puzzles of a batch, compact files line by line
+    :param source: a directory, a glob pattern, a (multi-puzzle) file or a compact file
+    :return: generator of (name, text) tuples in input order
+    """
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.txt")))
+    elif os.path.isfile(source):
+        paths = [source]
+    else:
+        paths = sorted(glob.glob(source))
+
+    for path in paths:
+        name = os.path.basename(path)
+        if is_compact_file(path):
+            for number, line in puzzle_format.iter_lines(path):
+                yield f"{name}:{number}", line
+            continue
+        with open(path, "r") as file:
+            texts = split_puzzles(file.read())
+        if len(texts) == 1:
+            yield name, texts[0]
+        else:
+            for number, text in enumerate(texts, 1):
+                yield f"{name}#{number}", text
+
+
+def collect_puzzles(source):
+    """
+    Collect the puzzles of a batch
+    :param source: a directory, a glob pattern, a (multi-puzzle) file or a compact file
+    :return: list of (name, text) tuples in input order
+    """
+    return list(iter_puzzles(source))
+
+
+def _init_worker(forward_checking, propagation, negative_constraint, engine="backtracking",
+                 backjumping=False, nogood_limit=0, cache_path=None, cache_size=None,
+                 value_order="ascending", random_seed=None, restart_unit=0):
+    """
+    Set the solver options of a worker process, every worker opens its own connection to the solution cache
+    """
+    sudoku_solver.FORWARD_CHECKING = forward_checking
+    sudoku_solver.PROPAGATION = propagation
+    sudoku_solver.NEGATIVE_CONSTRAINT = negative_constraint
+    sudoku_solver.ENGINE = engine
+    sudoku_solver.BACKJUMPING = backjumping
+    sudoku_solver.NOGOOD_LIMIT = nogood_limit
+    sudoku_solver.VALUE_ORDER = value_order
+    sudoku_solver.RANDOM_SEED = random_seed
+    sudoku_solver.RESTART_UNIT = restart_unit
+    if cache_path:
+        import solution_cache
+        sudoku_solver.SOLUTION_CACHE = solution_cache.SolutionCache(
+            cache_path, cache_size or solution_cache.DEFAULT_CAPACITY
+        )
+
+
+def solve_puzzle(task):
+    """
+    Solve one puzzle of a batch, catching its failures so they do not stop the batch
+    :param task: (position, name, text, timeout, node_limit, count_limit) tuple, timeout in seconds or None,
+        node_limit or None, count_limit or None to stop at the first solution
+    :return: dictionary with the position, name, status, solution, number of solutions, error,
+        search statistics, whether the solution cache answered and time of the puzzle
+    """
+    position, name, text, timeout, node_limit, count_limit = task
+    result = {"position": position, "name": name, "status": "unsatisfiable", "solution": None,
+              "solution_count": None, "error": None, "stats": None, "cached": False, "vectorized": False}
+    start = time.time()
+    cache = sudoku_solver.SOLUTION_CACHE
+    hits = cache.hits if cache is not None else 0
+
+    try:
+        board_data = puzzle_format.parse_puzzle(text)
+        givens = [line[:] for line in board_data[0]]
+        limits = None
+        if timeout or node_limit:
+            limits = sudoku_solver.SearchLimits.from_time_limit(node_limit, timeout)
+        solve_result = sudoku_solver.solve(board_data, limits=limits, count_limit=count_limit)
+        solution = solve_result.solution
+        result["status"] = solve_result.status
+        if count_limit:
+            result["solution_count"] = solve_result.solution_count
+        result["stats"] = solve_result.stats.to_dict()
+        if solution:
+            result["solution"] = solution
+            if not sudoku_solver.check_solution((givens, board_data[1], board_data[2]), solution):
+                result["status"] = "invalid"
+    except Exception as error:
+        result["status"] = "error"
+        result["error"] = f"{type(error).__name__}: {error}"
+    if cache is not None:
+        result["cached"] = cache.hits > hits
+
+    result["time"] = time.time() - start
+    return result
+
+
+def run_batch(puzzles, processes=None, chunksize=None, ordered=True, timeout=None,
+              forward_checking=False, propagation=False, negative_constraint=False, node_limit=None, count_limit=None,
+              engine="backtracking", backjumping=False, nogood_limit=0, cache_path=None, cache_size=None,
+              value_order="ascending", random_seed=None, restart_unit=0):
+    """
+    Solve a batch of puzzles on a process pool
+    :param puzzles: list or iterable of (name, text) tuples, an iterable is consumed as the workers need puzzles
+    :param processes: number of worker processes, the number of cores when not given
+    :param chunksize: number of puzzles sent to a worker at once, picked when not given so every worker gets
+        about CHUNKS_PER_WORKER chunks, at most STREAM_CHUNKSIZE puzzles each for an iterable
+    :param ordered: yield the results in input order, otherwise in completion order
+    :param timeout: time limit in seconds for every puzzle, or None
+    :param forward_checking: whether to solve with forward checking
+    :param propagation: whether to solve with constraint propagation
+    :param negative_constraint: whether to enforce the negative constraint
+    :param node_limit: search node budget for every puzzle, or None
+    :param count_limit: count the solutions of every puzzle up to this number, or None to stop at the first solution
+    :param engine: search engine, one of sudoku_solver.ENGINES
+    :param backjumping: whether to solve with conflict-directed backjumping
+    :param nogood_limit: number of learned nogoods kept with backjumping
+    :param cache_path: SQLite file of the solution cache shared by the workers, or None to always search
+    :param cache_size: number of puzzles kept in the solution cache, solution_cache.DEFAULT_CAPACITY when not given
+    :param value_order: order of the values tried in a cell, one of sudoku_solver.VALUE_ORDERS
+    :param random_seed: seed of the random value order and of the tie breaks of the restarts, or None
+    :param restart_unit: node budget unit of the Luby restarts, 0 for no restarts
+    :return: generator of the result dictionaries of solve_puzzle
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if chunksize is None:
+        if not hasattr(puzzles, "__len__"):
+            # Read ahead the start of the stream: a stream ending within it is chunked like a list
+            puzzles = iter(puzzles)
+            read_ahead = processes * CHUNKS_PER_WORKER * STREAM_CHUNKSIZE
+            head = list(itertools.islice(puzzles, read_ahead))
+            puzzles = head if len(head) < read_ahead else itertools.chain(head, puzzles)
+        if hasattr(puzzles, "__len__"):
+            chunksize = max(1, len(puzzles) // (processes * CHUNKS_PER_WORKER))
+        else:
+            chunksize = STREAM_CHUNKSIZE
+    tasks = (
+        (position, name, text, timeout, node_limit, count_limit) for position, (name, text) in enumerate(puzzles)
+    )
+    options = (
+        forward_checking, propagation, negative_constraint, engine, backjumping, nogood_limit, cache_path, cache_size,
+        value_order, random_seed, restart_unit
+    )
+
+    if processes == 1:
+        _init_worker(*options)
+        try:
+            for task in tasks:
+                yield solve_puzzle(task)
+        finally:
+            if sudoku_solver.SOLUTION_CACHE is not None:
+                sudoku_solver.SOLUTION_CACHE.close()
+                sudoku_solver.SOLUTION_CACHE = None
+        return
+
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=options) as pool:
+        if ordered:
+            results = pool.imap(solve_puzzle, tasks, chunksize)
+        else:
+            results = pool.imap_unordered(solve_puzzle, tasks, chunksize)
+        for result in results:
+            yield result
+
+
+def has_grid_shape(board_data):
+    """
+    :return: whether the board and dots of a puzzle have the shapes of a supported grid and the values are in range
+    """
+    board, horizontal_dots, vertical_dots = board_data
+    size = len(board)
+    return (
+        1 < size <= sudoku_solver.MAX_SIZE
+        and all(len(line) == size and all(0 <= value <= size for value in line) for line in board)
+        and len(horizontal_dots) == size and all(len(line) == size - 1 for line in horizontal_dots)
+        and len(vertical_dots) == size - 1 and all(len(line) == size for line in vertical_dots)
+        and all(dot in (0, 1, 2) for dots in (horizontal_dots, vertical_dots) for line in dots for dot in line)
+    )
+
+
+def run_vectorized_batch(puzzles, batch_size=VECTORIZED_BATCH_SIZE, ordered=True, negative_constraint=False,
+                         count_limit=None, **options):
+    """
+    Solve a batch of puzzles with the vectorized front-end: the puzzles are read batch_size at a time, the
+    puzzles of every grid size are propagated together with NumPy (see vectorized_propagation), and only the
+    puzzles propagation leaves with open cells are searched by run_batch, starting from the fixed cells
+    :param puzzles: list or iterable of (name, text) tuples
+    :param batch_size: number of puzzles propagated together
+    :param ordered: yield the results in input order, otherwise the propagated puzzles of a batch come first
+    :param negative_constraint: whether to enforce the negative constraint
+    :param count_limit: count the solutions of every puzzle up to this number, or None to stop at the first solution
+    :param options: the other options of run_batch
+    :return: generator of the result dictionaries of solve_puzzle
+    """
+    puzzles = iter(puzzles)
+    first_position = 0
+    while True:
+        batch = list(itertools.islice(puzzles, batch_size))
+        if not batch:
+            return
+        start = time.time()
+        results = [None] * len(batch)
+        open_puzzles = []
+        open_positions = []
+        groups = {}
+        for position, (name, text) in enumerate(batch):
+            try:
+                board_data = puzzle_format.parse_puzzle(text)
+            except Exception:
+                board_data = None
+            if board_data is None or not has_grid_shape(board_data):
+                # Searched one by one, which reports why the puzzle is invalid
+                open_puzzles.append((name, text))
+                open_positions.append(position)
+            else:
+                groups.setdefault(len(board_data[0]), []).append((position, board_data))
+
+        for group in groups.values():
+            outcomes = vectorized_propagation.propagate_boards([board_data for _, board_data in group],
+                                                               negative_constraint)
+            for (position, board_data), (status, board) in zip(group, outcomes):
+                name = batch[position][0]
+                if status == "open":
+                    open_puzzles.append((name, puzzle_format.encode_puzzle((board, board_data[1], board_data[2]))))
+                    open_positions.append(position)
+                    continue
+                results[position] = {
+                    "position": first_position + position, "name": name, "status": status,
+                    "solution": board if status == "solved" else None,
+                    "solution_count": (1 if status == "solved" else 0) if count_limit else None,
+                    "error": None, "stats": None, "cached": False, "vectorized": True,
+                }
+        propagated_time = (time.time() - start) / len(batch)
+        for result in results:
+            if result is not None:
+                result["time"] = propagated_time
+                if not ordered:
+                    yield result
+
+        searched = run_batch(
+            open_puzzles, ordered=ordered, negative_constraint=negative_constraint, count_limit=count_limit, **options
+        )
+        for result in searched:
+            position = open_positions[result["position"]]
+            result["position"] = first_position + position
+            if not ordered:
+                yield result
+            results[position] = result
+
+        if ordered:
+            for result in results:
+                yield result
+        first_position += len(batch)
+
+
+def write_result(file, result):
+    """
+    Write the result of a puzzle to the batch output file
+    :param file: the opened output file
+    :param result: result dictionary of solve_puzzle
+    """
+    details = f"{round(result['time'], 4)} seconds"
+    if result["stats"]:
+        details += f", {result['stats']['nodes']} nodes"
+    if result["solution_count"] is not None:
+        details += f", {result['solution_count']} solutions"
+    if result["cached"]:
+        details += ", cached"
+    if result["vectorized"]:
+        details += ", vectorized"
+    print(f"# {result['name']}: {result['status']} ({details})", file=file)
+    if result["error"]:
+        print(f"# {result['error']}", file=file)
+    if result["solution"]:
+        print(sudoku_solver.sudoku_to_str(result["solution"]), file=file)
+    print(file=file)
+
+
+def main(argv=None):
+    """
+    Main method of the batch subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog="sudoku_solver.py batch", description="Solve a batch of Kropki Sudoku puzzles on a process pool."
+    )
+    parser.add_argument("source", type=str, help="Directory, glob pattern or multi-puzzle file to solve")
+    parser.add_argument(
+        "-o", "--output_file", type=str, help="Name of the output file to be saved in the Outputs folder"
+    )
+    parser.add_argument("-j", "--processes", type=int, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--chunksize", type=int, help="Number of puzzles sent to a worker at once")
+    parser.add_argument(
+        "--unordered", action="store_true", help="Write the results in completion order instead of input order"
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Write the solutions in the compact format, one line per puzzle ('-' without a solution)"
+    )
+    parser.add_argument("-t", "--timeout", type=float, help="Time limit in seconds for every puzzle")
+    parser.add_argument("--node-limit", type=int, help="Search node budget for every puzzle")
+    parser.add_argument("--count", type=int, help="Count the solutions of every puzzle up to this number")
+    parser.add_argument(
+        "--unique", action="store_true", help="Check that every puzzle has exactly one solution (same as --count 2)"
+    )
+    parser.add_argument("--engine", choices=sudoku_solver.ENGINES, default="backtracking", help="Search engine")
+    parser.add_argument(
+        "-fc", "--forward-checking", action="store_true", help="Enable forward checking in the solving algorithm"
+    )
+    parser.add_argument("-p", "--propagation", action="store_true", help="Enable constraint propagation")
+    parser.add_argument("-b", "--backjumping", action="store_true", help="Enable conflict-directed backjumping")
+    parser.add_argument("--nogoods", type=int, default=0, help="Number of learned nogoods kept with backjumping")
+    parser.add_argument(
+        "--value-order", choices=sudoku_solver.VALUE_ORDERS, default="ascending",
+        help="Order of the values tried in a cell"
+    )
+    parser.add_argument("--seed", type=int, help="Seed of the random value order and of the tie breaks of the restarts")
+    parser.add_argument(
+        "--restarts", type=int, default=0, help="Restart every search after this many nodes times the Luby sequence"
+    )
+    parser.add_argument("-n", "--negative-constraint", action="store_true", help="Enforce the negative constraint")
+    parser.add_argument(
+        "--cache", type=str, help="SQLite file of solved puzzles, looked up under every rotation and reflection"
+    )
+    parser.add_argument(
+        "--vectorized", action="store_true",
+        help="Propagate the givens of many puzzles together with NumPy and only search the puzzles left open"
+    )
+    parser.add_argument(
+        "--vectorized-batch", type=int, default=VECTORIZED_BATCH_SIZE,
+        help="Number of puzzles propagated together by --vectorized"
+    )
+    parser.add_argument("--cache-size", type=int, default=100000, help="Number of puzzles kept in the cache")
+    args = parser.parse_args(argv)
+    if args.vectorized and not vectorized_propagation.available():
+        parser.error("--vectorized requires NumPy")
+    if args.restarts and args.value_order == "ascending":
+        parser.error("--restarts requires a --value-order other than ascending, every run would be the same")
+    count_limit = 2 if args.unique and not args.count else args.count
+
+    if args.output_file:
+        output_path = os.path.join("Outputs", args.output_file)
+    else:
+        timestamp = datetime.now().strftime("%Y-%m-%d__%H-%M-%S")
+        output_path = os.path.join("Outputs", f"{timestamp}__Batch_Output.txt")
+
+    start = time.time()
+    # The puzzles are streamed, so a large compact file is never loaded whole
+    puzzles = iter_puzzles(args.source)
+    first = next(puzzles, None)
+    if first is None:
+        print(f"No puzzles found in '{args.source}'")
+        return
+    puzzles = itertools.chain([first], puzzles)
+
+    print("Solving puzzles...")
+    counts = {}
+    puzzle_count = 0
+    if args.compact:
+        writer = puzzle_format.SolutionWriter(output_path)
+    else:
+        writer = open(output_path, "w")
+    with writer:
+        if args.vectorized:
+            results = run_vectorized_batch(
+                puzzles, args.vectorized_batch, not args.unordered, args.negative_constraint, count_limit,
+                processes=args.processes, chunksize=args.chunksize, timeout=args.timeout,
+                forward_checking=args.forward_checking, propagation=args.propagation, node_limit=args.node_limit,
+                engine=args.engine, backjumping=args.backjumping, nogood_limit=args.nogoods,
+                cache_path=args.cache, cache_size=args.cache_size, value_order=args.value_order,
+                random_seed=args.seed, restart_unit=args.restarts
+            )
+        else:
+            results = run_batch(
+                puzzles, args.processes, args.chunksize, not args.unordered, args.timeout,
+                args.forward_checking, args.propagation, args.negative_constraint, args.node_limit, count_limit,
+                args.engine, args.backjumping, args.nogoods, args.cache, args.cache_size,
+                args.value_order, args.seed, args.restarts
+            )
+        for result in results:
+            puzzle_count += 1
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if args.unique and result["status"] == "solved" and result["solution_count"] > 1:
+                counts["not unique"] = counts.get("not unique", 0) + 1
+            if result["cached"]:
+                counts["cached"] = counts.get("cached", 0) + 1
+            if result["vectorized"]:
+                counts["vectorized"] = counts.get("vectorized", 0) + 1
+            if args.compact:
+                writer.write(result["solution"])
+            else:
+                write_result(writer, result)
+
+    end = time.time()
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    print(f"Results saved to '{output_path}'")
+    print(
+        f"Total time taken: {round(end - start, 2)} seconds "
+        f"({puzzle_count} puzzles, {round(puzzle_count / (end - start), 2)} puzzles/second)"
+    )
+
+
+if __name__ == "__main__":
+    main()
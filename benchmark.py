@@ -0,0 +1,350 @@
+import os
+import sys
+import copy
+import glob
+import json
+import random
+import argparse
+import platform
+import time
+from datetime import datetime
+
+import sudoku_solver
+import batch_solver
+import puzzle_format
+from puzzle_generator import solution_dots
+from puzzle_symmetry import SYMMETRIES, box_symmetries, transform_board, transform_puzzle
+
+
+# Solver settings of every engine mode
+MODES = {
+    "plain": {},
+    "fc": {"FORWARD_CHECKING": True},
+    "propagation": {"PROPAGATION": True},
+    "fc+propagation": {"FORWARD_CHECKING": True, "PROPAGATION": True},
+    "fc+backjumping": {"FORWARD_CHECKING": True, "BACKJUMPING": True},
+    "fc+nogoods": {"FORWARD_CHECKING": True, "BACKJUMPING": True, "NOGOOD_LIMIT": 1000},
+    "fc+lcv": {"FORWARD_CHECKING": True, "VALUE_ORDER": "lcv"},
+    "fc+dot-order": {"FORWARD_CHECKING": True, "VALUE_ORDER": "dot"},
+    "fc+restarts": {"FORWARD_CHECKING": True, "VALUE_ORDER": "lcv", "RANDOM_SEED": 1, "RESTART_UNIT": 100},
+    "dlx": {"ENGINE": "dlx"},
+}
+
+# Value of every solver setting when an engine mode does not set it
+DEFAULT_SETTINGS = {
+    "FORWARD_CHECKING": False,
+    "PROPAGATION": False,
+    "BACKJUMPING": False,
+    "NOGOOD_LIMIT": 0,
+    "VALUE_ORDER": "ascending",
+    "RANDOM_SEED": None,
+    "RESTART_UNIT": 0,
+    "ENGINE": "backtracking",
+}
+
+# Time differences below this many seconds are treated as noise when comparing with a baseline
+TIME_NOISE_FLOOR = 0.005
+
+# Generated corpora of every grid size: size, number of puzzles and fraction of the cells kept as givens
+GRID_CORPORA = {
+    "grid4": (4, 20, 0.0),
+    "grid6": (6, 20, 0.1),
+    "grid9": (9, 10, 0.1),
+    "grid16": (16, 5, 0.35),
+}
+
+# Seed of the generated corpora, so every run solves the same puzzles
+GRID_SEED = 2024
+
+
+def load_reference(file_path):
+    """
+    Load a reference solution from the Outputs folder
+    :param file_path: the path of the output file
+    :return: the solved board, or None if there is no such file
+    """
+    if not os.path.isfile(file_path):
+        return None
+    with open(file_path, "r") as file:
+        return [[int(elem) for elem in line.split()] for line in file if line.strip()]
+
+
+def bundled_corpus():
+    """
+    Load the puzzles of the Inputs folder with the matching solutions of the Outputs folder
+    :return: list of (name, board_data, reference) tuples, reference is None for puzzles without a solution file
+    """
+    corpus = []
+    for path in sorted(glob.glob(os.path.join("Inputs", "*.txt"))):
+        name = os.path.basename(path)
+        reference = load_reference(os.path.join("Outputs", name.replace("Input", "Output")))
+        corpus.append((name, sudoku_solver.process_input(path), reference))
+    return corpus
+
+
+def symmetric_corpus():
+    """
+    Generate the bundled puzzles under all the grid symmetries keeping their boxes (all 8 for 9x9 grids),
+    with the references transformed the same way
+    :return: list of (name, board_data, reference) tuples
+    """
+    corpus = []
+    for name, board_data, reference in bundled_corpus():
+        for symmetry in box_symmetries(*sudoku_solver.box_shape(len(board_data[0]))):
+            symmetry_name = SYMMETRIES[symmetry][0]
+            transformed_reference = transform_board(reference, symmetry) if reference else None
+            corpus.append((f"{name}:{symmetry_name}", transform_puzzle(board_data, symmetry), transformed_reference))
+    return corpus
+
+
+def random_solution(size, rng):
+    """
+    Generate a random solved grid: shuffle the rows within their bands, the bands, the columns within their stacks
+    and the stacks of a pattern grid, then relabel the values
+    :param size: number of rows of the grid
+    :param rng: random.Random generator
+    :return: the solved board as a 2D list
+    """
+    box_rows, box_columns = sudoku_solver.box_shape(size)
+
+    def shuffled(group_size, groups):
+        order = []
+        for group in rng.sample(range(groups), groups):
+            order.extend(group * group_size + offset for offset in rng.sample(range(group_size), group_size))
+        return order
+
+    rows = shuffled(box_rows, size // box_rows)
+    columns = shuffled(box_columns, size // box_columns)
+    labels = rng.sample(range(1, size + 1), size)
+    # Every row of the pattern is shifted by a box width within a band and by one between bands
+    return [
+        [labels[(box_columns * (row % box_rows) + row // box_rows + column) % size] for column in columns]
+        for row in rows
+    ]
+
+
+def grid_corpus(size, count, givens_fraction, seed=GRID_SEED):
+    """
+    Generate puzzles of a grid size from random solutions, with every dot of the solution and some of its values
+    as givens. The puzzles are not checked for uniqueness, so their solutions are checked against the rules
+    :param size: number of rows of the grid
+    :param count: number of puzzles
+    :param givens_fraction: fraction of the cells kept as givens
+    :param seed: seed of the generator
+    :return: list of (name, board_data, reference) tuples
+    """
+    rng = random.Random(f"{seed}:{size}")
+    corpus = []
+    for number in range(count):
+        solution = random_solution(size, rng)
+        horizontal_dots, vertical_dots = solution_dots(solution, rng)
+        givens = set(rng.sample(range(size * size), int(size * size * givens_fraction)))
+        board = [
+            [solution[row][column] if row * size + column in givens else 0 for column in range(size)]
+            for row in range(size)
+        ]
+        corpus.append((f"{size}x{size}-{number + 1}", (board, horizontal_dots, vertical_dots), None))
+    return corpus
+
+
+CORPORA = {
+    "bundled": bundled_corpus,
+    "symmetric": symmetric_corpus,
+}
+for _name, _parameters in GRID_CORPORA.items():
+    CORPORA[_name] = lambda parameters=_parameters: grid_corpus(*parameters)
+
+
+def load_corpus(name):
+    """
+    Load a named corpus, or the puzzles of a directory, glob pattern, multi-puzzle file or compact file
+    :param name: name in CORPORA or a path
+    :return: list of (name, board_data, reference) tuples
+    """
+    if name in CORPORA:
+        return CORPORA[name]()
+    return [
+        (puzzle_name, puzzle_format.parse_puzzle(text), None)
+        for puzzle_name, text in batch_solver.collect_puzzles(name)
+    ]
+
+
+def percentile(values, percent):
+    """
+    Find a percentile of a list of values with the nearest-rank method
+    :param values: non-empty list of numbers
+    :param percent: percentile between 0 and 100
+    :return: the value at that percentile
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def set_mode(mode, negative_constraint):
+    """
+    Set the solver flags of an engine mode
+    """
+    for name, default in DEFAULT_SETTINGS.items():
+        setattr(sudoku_solver, name, MODES[mode].get(name, default))
+    sudoku_solver.NEGATIVE_CONSTRAINT = negative_constraint
+
+
+def run_benchmark(corpus, mode, repeat, negative_constraint=False):
+    """
+    Solve every puzzle of a corpus several times under an engine mode
+    :param corpus: list of (name, board_data, reference) tuples
+    :param mode: name of the engine mode in MODES
+    :param repeat: number of runs of every puzzle
+    :param negative_constraint: whether to enforce the negative constraint
+    :return: dictionary summarizing the wall times, nodes and failures
+    """
+    set_mode(mode, negative_constraint)
+    times = []
+    best_times = []
+    nodes = []
+    failures = []
+
+    for name, board_data, reference in corpus:
+        puzzle_times = []
+        for _ in range(repeat):
+            run_data = copy.deepcopy(board_data)
+            start = time.perf_counter()
+            result = sudoku_solver.solve(run_data)
+            puzzle_times.append(time.perf_counter() - start)
+
+        # The search is deterministic, so the last run stands for every run
+        nodes.append(result.stats.nodes)
+        if reference is not None:
+            correct = result.solution == reference
+        else:
+            correct = bool(result.solution) and sudoku_solver.check_solution(board_data, result.solution)
+        if not correct:
+            failures.append(name)
+        times.extend(puzzle_times)
+        best_times.append(min(puzzle_times))
+
+    return {
+        "puzzles": len(corpus),
+        "runs": len(times),
+        # The total uses the fastest run of every puzzle, which is the least sensitive to machine noise
+        "time_total": sum(best_times),
+        "time_mean": sum(times) / len(times),
+        "time_p50": percentile(times, 50),
+        "time_p90": percentile(times, 90),
+        "time_p99": percentile(times, 99),
+        "time_max": max(times),
+        "nodes_total": sum(nodes),
+        "nodes_p50": percentile(nodes, 50),
+        "nodes_max": max(nodes),
+        "failures": failures,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Find the corpus and mode pairs that got slower than the baseline
+    :param results: benchmark results keyed by "corpus/mode"
+    :param baseline: results of a previous run keyed the same way
+    :param threshold: allowed relative slowdown, 0.1 for 10%
+    :return: list of regression messages
+    """
+    regressions = []
+    for key, summary in results.items():
+        if key not in baseline:
+            continue
+        previous = baseline[key]
+        time_limit = previous["time_total"] * (1 + threshold)
+        if summary["time_total"] > time_limit and summary["time_total"] - previous["time_total"] > TIME_NOISE_FLOOR:
+            regressions.append(
+                f"{key}: time {previous['time_total']:.4f}s -> {summary['time_total']:.4f}s "
+                f"(+{(summary['time_total'] / previous['time_total'] - 1) * 100:.1f}%)"
+            )
+        if summary["nodes_total"] > previous["nodes_total"] * (1 + threshold):
+            regressions.append(f"{key}: nodes {previous['nodes_total']} -> {summary['nodes_total']}")
+    return regressions
+
+
+def print_results(results):
+    """
+    Print the benchmark results as a table
+    """
+    header = f"{'corpus/mode':<32} {'puzzles':>7} {'total s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} " \
+             f"{'nodes':>9} {'failures':>8}"
+    print(header)
+    print("-" * len(header))
+    for key, summary in results.items():
+        print(
+            f"{key:<32} {summary['puzzles']:>7} {summary['time_total']:>9.4f} {summary['time_p50'] * 1000:>9.3f} "
+            f"{summary['time_p90'] * 1000:>9.3f} {summary['time_p99'] * 1000:>9.3f} {summary['nodes_total']:>9} "
+            f"{len(summary['failures']):>8}"
+        )
+
+
+def main():
+    """
+    Main method to benchmark the solver and check it against a baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the Kropki Sudoku solver.")
+    parser.add_argument(
+        "corpora", nargs="*", default=["bundled"],
+        help=f"Corpora to solve: {', '.join(CORPORA)}, or a directory, glob pattern or multi-puzzle file"
+    )
+    parser.add_argument(
+        "-m", "--modes", nargs="+", choices=list(MODES), default=list(MODES), help="Engine modes to benchmark"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of runs of every puzzle")
+    parser.add_argument("-n", "--negative-constraint", action="store_true", help="Enforce the negative constraint")
+    parser.add_argument("--save-baseline", type=str, help="Save the results as a baseline JSON file")
+    parser.add_argument("--baseline", type=str, help="Baseline JSON file to compare the results with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Allowed relative slowdown against the baseline before failing (default: 0.2 for 20%%)"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for corpus_name in args.corpora:
+        corpus = load_corpus(corpus_name)
+        if not corpus:
+            print(f"No puzzles found in '{corpus_name}'")
+            sys.exit(2)
+        for mode in args.modes:
+            results[f"{corpus_name}/{mode}"] = run_benchmark(corpus, mode, args.repeat, args.negative_constraint)
+
+    print_results(results)
+    exit_code = 0
+
+    for key, summary in results.items():
+        for name in summary["failures"]:
+            print(f"Wrong or missing solution: {key} {name}")
+            exit_code = 1
+
+    if args.save_baseline:
+        baseline = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "negative_constraint": args.negative_constraint,
+            "results": results,
+        }
+        with open(args.save_baseline, "w") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"Baseline saved to '{args.save_baseline}'")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"No regression against '{args.baseline}' (threshold {args.threshold * 100:g}%)")
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import time
+
+import sudoku_solver
+from sudoku_solver import SearchStats, SolveResult, TRACE_DECISIONS, compile_puzzle
+
+
+# Exact-cover layout of a size x size Sudoku: a column for every constraint (a value in every cell, every value
+# in every row, every column and every box) and a row for every (cell, value) choice, index * size + value - 1.
+# Node 0 is the root, the column headers follow it and every row has 4 consecutive nodes after them.
+
+
+def _choice_columns(puzzle, choice):
+    """
+    Find the constraint columns covered by a choice
+    :param puzzle: CompiledPuzzle of the grid
+    :param choice: row of the matrix, index * size + value - 1
+    :return: the 4 column header nodes of the choice
+    """
+    size = puzzle.size
+    cells = puzzle.cells
+    index, digit = divmod(choice, size)
+    return (
+        1 + index,
+        1 + cells + puzzle.rows[index] * size + digit,
+        1 + 2 * cells + puzzle.columns[index] * size + digit,
+        1 + 3 * cells + puzzle.boxes[index] * size + digit,
+    )
+
+
+def _build_links(puzzle):
+    """
+    Build the links of the full exact-cover matrix of a grid, copied by every ExactCoverMatrix
+    :param puzzle: CompiledPuzzle of the grid
+    :return: the left, right, up, down, column, sizes lists
+    """
+    constraint_columns = 4 * puzzle.cells
+    first_row_node = constraint_columns + 1
+    choice_rows = puzzle.size * puzzle.cells
+    size = first_row_node + 4 * choice_rows
+    left = list(range(-1, size - 1))
+    right = list(range(1, size + 1))
+    up = list(range(size))
+    down = list(range(size))
+    column_of = list(range(size))
+    sizes = [0] * (constraint_columns + 1)
+
+    # Circular list of the column headers starting from the root
+    left[0] = constraint_columns
+    right[constraint_columns] = 0
+
+    for choice in range(choice_rows):
+        first = first_row_node + 4 * choice
+        for offset, column in enumerate(_choice_columns(puzzle, choice)):
+            node = first + offset
+            left[node] = first + (offset - 1) % 4
+            right[node] = first + (offset + 1) % 4
+            # Append the node at the bottom of its column
+            up[node] = up[column]
+            down[node] = column
+            down[up[column]] = node
+            up[column] = node
+            column_of[node] = column
+            sizes[column] += 1
+
+    return left, right, up, down, column_of, sizes
+
+
+# Links of the full matrix of every grid size, built on first use (the box shape follows from the size)
+_LINKS = {}
+
+
+class ExactCoverMatrix:
+    """
+    Dancing links matrix of the Sudoku exact cover (Knuth's Algorithm X). Covering a column unlinks
+    the rows that intersect it, and uncovering in the reverse order links them back.
+
+    The Kropki dots are side constraints outside of the exact cover: when a choice is made, the rows
+    of its dot neighbours that are incompatible with the value are removed from the matrix, so the column
+    sizes (and the column selection) account for the dots. Removed rows are restored from a trail.
+    """
+
+    def __init__(self, puzzle):
+        """
+        Copy the links of the full matrix
+        :param puzzle: CompiledPuzzle of the dots
+        """
+        if puzzle.size not in _LINKS:
+            _LINKS[puzzle.size] = _build_links(puzzle)
+        self.puzzle = puzzle
+        self.size = puzzle.size
+        self.first_row_node = 4 * puzzle.cells + 1
+        self.left, self.right, self.up, self.down, self.column_of, self.sizes = (
+            list(links) for links in _LINKS[puzzle.size]
+        )
+        self.filled = [False] * puzzle.cells
+        self.removed = []
+
+    def cover(self, column):
+        """
+        Remove a column header and every row intersecting the column
+        """
+        left, right, up, down, column_of, sizes = (
+            self.left, self.right, self.up, self.down, self.column_of, self.sizes
+        )
+        left[right[column]] = left[column]
+        right[left[column]] = right[column]
+        row_node = down[column]
+        while row_node != column:
+            node = right[row_node]
+            while node != row_node:
+                up[down[node]] = up[node]
+                down[up[node]] = down[node]
+                sizes[column_of[node]] -= 1
+                node = right[node]
+            row_node = down[row_node]
+
+    def uncover(self, column):
+        """
+        Link back a column covered last, in the reverse order of cover
+        """
+        left, right, up, down, column_of, sizes = (
+            self.left, self.right, self.up, self.down, self.column_of, self.sizes
+        )
+        row_node = up[column]
+        while row_node != column:
+            node = left[row_node]
+            while node != row_node:
+                sizes[column_of[node]] += 1
+                up[down[node]] = node
+                down[up[node]] = node
+                node = left[node]
+            row_node = up[row_node]
+        left[right[column]] = column
+        right[left[column]] = column
+
+    def smallest_column(self):
+        """
+        :return: the uncovered column with the fewest rows, first in column order on ties,
+            or 0 if every column is covered
+        """
+        right = self.right
+        sizes = self.sizes
+        best = 0
+        best_size = self.size + 1
+        column = right[0]
+        while column != 0:
+            if sizes[column] < best_size:
+                best = column
+                best_size = sizes[column]
+                if best_size <= 1:
+                    break
+            column = right[column]
+        return best
+
+    def is_linked(self, choice):
+        """
+        :return: whether every node of a row is linked in its column, that is the row is neither covered nor removed
+        """
+        up = self.up
+        down = self.down
+        first = self.first_row_node + 4 * choice
+        for node in range(first, first + 4):
+            if down[up[node]] != node:
+                return False
+        return True
+
+    def select(self, row_node):
+        """
+        Make a choice: cover the other columns of its row, then remove the rows of its dot neighbours
+        that break a dot. The column of row_node must already be covered
+        :param row_node: a node of the row of the choice
+        :return: the length of the removed rows trail before the choice, to be passed to deselect
+        """
+        right, up, down, column_of, sizes = self.right, self.up, self.down, self.column_of, self.sizes
+        node = right[row_node]
+        while node != row_node:
+            self.cover(column_of[node])
+            node = right[node]
+        size = self.size
+        first_row_node = self.first_row_node
+        index, digit = divmod((row_node - first_row_node) // 4, size)
+        self.filled[index] = True
+
+        mark = len(self.removed)
+        for other, dot in self.puzzle.dot_neighbours[index]:
+            if self.filled[other]:
+                continue
+            allowed = self.puzzle.dot_masks[dot][digit + 1]
+            for other_digit in range(size):
+                other_choice = other * size + other_digit
+                if allowed >> (other_digit + 1) & 1 or not self.is_linked(other_choice):
+                    continue
+                other_first = first_row_node + 4 * other_choice
+                for node in range(other_first, other_first + 4):
+                    up[down[node]] = up[node]
+                    down[up[node]] = down[node]
+                    sizes[column_of[node]] -= 1
+                self.removed.append(other_choice)
+        return mark
+
+    def deselect(self, row_node, mark):
+        """
+        Undo the choice made last: restore the removed rows, then uncover the other columns of its row
+        :param row_node: the node given to select
+        :param mark: the value returned by select
+        """
+        left, up, down, column_of, sizes = self.left, self.up, self.down, self.column_of, self.sizes
+        removed = self.removed
+        first_row_node = self.first_row_node
+        while len(removed) > mark:
+            other_first = first_row_node + 4 * removed.pop()
+            for node in range(other_first + 3, other_first - 1, -1):
+                sizes[column_of[node]] += 1
+                up[down[node]] = node
+                down[up[node]] = node
+        self.filled[(row_node - first_row_node) // 4 // self.size] = False
+        node = left[row_node]
+        while node != row_node:
+            self.uncover(column_of[node])
+            node = left[node]
+
+
+def search(matrix, stats, limits=None, solutions=None, count_limit=None):
+    """
+    Algorithm X on an explicit stack, with the same limits and solution counting as the backtracking search
+    :param matrix: ExactCoverMatrix with the givens selected
+    :param stats: SearchStats to update
+    :param limits: SearchLimits of the search, or None for an unbounded search
+    :param solutions: list collecting the chosen rows of every solution,
+        the search stops at the first one when not given
+    :param count_limit: number of solutions after which the search stops when collecting them, or None for all
+    :return: the status of the search and the rows chosen when it ended
+    """
+    right = matrix.right
+    down = matrix.down
+    size = matrix.size
+    first_row_node = matrix.first_row_node
+    tracer = sudoku_solver.TRACER
+    chosen = []
+
+    # Every frame is [column, current row node (the column header before the first row), removed rows mark]
+    stack = []
+    while True:
+        if limits is not None:
+            status = limits.check(stats.nodes)
+            if status:
+                return status, chosen
+        stats.nodes += 1
+        if len(stack) > stats.max_depth:
+            stats.max_depth = len(stack)
+
+        if right[0] == 0:
+            if tracer.level >= TRACE_DECISIONS:
+                tracer.record("Solution found!")
+            if solutions is None:
+                return "solved", chosen
+            solutions.append(list(chosen))
+            if count_limit is not None and len(solutions) >= count_limit:
+                return "solved", chosen
+        else:
+            clock = time.perf_counter()
+            column = matrix.smallest_column()
+            matrix.cover(column)
+            stack.append([column, column, None])
+            stats.selection_time += time.perf_counter() - clock
+
+        # Try the next row of the deepest frame, popping the frames without rows left
+        while stack:
+            frame = stack[-1]
+            column, row_node, mark = frame
+            if mark is not None:
+                matrix.deselect(row_node, mark)
+                chosen.pop()
+                stats.backtracks += 1
+
+            row_node = down[row_node]
+            if row_node == column:
+                if tracer.level >= TRACE_DECISIONS:
+                    tracer.record("No row left for constraint column {}, backtracking", column)
+                matrix.uncover(column)
+                stack.pop()
+                continue
+
+            choice = (row_node - first_row_node) // 4
+            frame[1] = row_node
+            clock = time.perf_counter()
+            mark = matrix.select(row_node)
+            frame[2] = mark
+            stats.forward_check_prunings += len(matrix.removed) - mark
+            stats.candidate_time += time.perf_counter() - clock
+            chosen.append(choice)
+            if tracer.level >= TRACE_DECISIONS:
+                index, digit = divmod(choice, size)
+                tracer.record("Assign {} to ({}, {})", digit + 1, index // size, index % size)
+            break
+        else:
+            return ("solved" if solutions else "unsatisfiable"), chosen
+
+
+def fill_board(board, choices):
+    """
+    Write the values of chosen rows on a board
+    :param board: the 2D board to fill in place
+    :param choices: rows of the matrix, index * size + value - 1
+    """
+    size = len(board)
+    for choice in choices:
+        index, digit = divmod(choice, size)
+        board[index // size][index % size] = digit + 1
+
+
+def solve(board_data, puzzle=None, limits=None, count_limit=None):
+    """
+    Solve a puzzle as an exact cover problem, with the same interface as sudoku_solver.solve.
+    Forward checking and propagation do not apply, the dots are always enforced when a row is chosen
+    :param board_data: board and dots data, the board is filled in place when the puzzle is solved
+        and left with its givens otherwise
+    :param puzzle: CompiledPuzzle to reuse, compiled from board_data when not given
+    :param limits: SearchLimits of the search, or None for an unbounded search
+    :param count_limit: when given, keep searching after the first solution and count the solutions up to this number
+    :return: a SolveResult with the solution and the statistics of the search
+    """
+    stats = SearchStats()
+    start = time.perf_counter()
+    if puzzle is None:
+        puzzle = compile_puzzle(board_data)
+    board = board_data[0]
+    matrix = ExactCoverMatrix(puzzle)
+
+    # The givens are selected before the search, a given already excluded by the others makes the puzzle unsatisfiable
+    consistent = True
+    size = puzzle.size
+    for index in range(puzzle.cells):
+        value = board[index // size][index % size]
+        if value == 0:
+            continue
+        choice = index * size + value - 1
+        if not matrix.is_linked(choice):
+            consistent = False
+            break
+        row_node = matrix.first_row_node + 4 * choice
+        matrix.cover(matrix.column_of[row_node])
+        matrix.select(row_node)
+    stats.candidate_time += time.perf_counter() - start
+
+    solutions = [] if count_limit is not None else None
+    status, chosen = "unsatisfiable", []
+    if consistent:
+        status, chosen = search(matrix, stats, limits, solutions, count_limit)
+
+    partial = None
+    if status != "solved" and status != "unsatisfiable":
+        partial = [line[:] for line in board]
+        fill_board(partial, chosen)
+    boards = None
+    if solutions is not None:
+        boards = []
+        for choices in solutions:
+            solution = [line[:] for line in board]
+            fill_board(solution, choices)
+            boards.append(solution)
+    solution = False
+    if solutions:
+        # A counting search stopped after finding solutions keeps its status, the board takes the first solution
+        fill_board(board, solutions[0])
+        solution = board
+    elif status == "solved":
+        fill_board(board, chosen)
+        solution = board
+    result = SolveResult(status, solution, stats, partial, boards)
+    stats.total_time = time.perf_counter() - start
+    return result
@@ -0,0 +1,203 @@
+import os
+import time
+import random
+import threading
+import collections
+import multiprocessing
+
+import sudoku_solver
+import batch_solver
+
+
+# Number of subproblems per worker process, enough for the fast workers to take over the slow subtrees
+SPLIT_FACTOR = 8
+
+# Number of search nodes between two checks of the shared stop event, which costs a lock
+CANCEL_POLL_INTERVAL = 256
+
+# Seconds between two checks of the cancellation token of the caller
+CANCEL_WATCH_INTERVAL = 0.01
+
+# Dots, compiled puzzle and stop event of a worker process, set by _init_worker
+_WORKER = {}
+
+
+class PollingToken:
+    """
+    Cancellation token checking a multiprocessing event only every few calls, so the search
+    does not take the lock of the event at every node
+    """
+
+    def __init__(self, event, interval=CANCEL_POLL_INTERVAL):
+        self.event = event
+        self.interval = interval
+        self.calls = 0
+
+    def is_set(self):
+        self.calls += 1
+        if self.calls < self.interval:
+            return False
+        self.calls = 0
+        return self.event.is_set()
+
+
+def split_puzzle(board_data, puzzle, target):
+    """
+    Expand the top levels of the search tree breadth first into independent subproblems, branching on the cells
+    the search would pick (MRV, then degree) and their values in the VALUE_ORDER of the search. Branches left
+    without a candidate in some cell, or inconsistent after propagation when PROPAGATION is set, are dropped
+    :param board_data: board and dots data
+    :param puzzle: CompiledPuzzle of the dots
+    :param target: number of subproblems to reach, the expansion stops earlier when the tree runs out of branches
+    :return: the boards of the subproblems (givens plus the decisions leading to them) in search order,
+        and the solutions reached during the expansion
+    """
+    _, horizontal_dots, vertical_dots = board_data
+    cells = puzzle.cells
+    frontier = collections.deque([[line[:] for line in board_data[0]]])
+    subproblems = []
+    solutions = []
+    # The random and tie breaking orders draw from one generator seeded with RANDOM_SEED, as in solve_uncached
+    rng = None
+    if sudoku_solver.VALUE_ORDER == "random" or (
+        sudoku_solver.RESTART_UNIT and sudoku_solver.VALUE_ORDER != "ascending"
+    ):
+        rng = random.Random(sudoku_solver.RANDOM_SEED)
+
+    if not sudoku_solver.CandidateEngine(board_data, puzzle).givens_consistent:
+        return subproblems, solutions
+    while frontier and len(frontier) + len(subproblems) < target:
+        board = frontier.popleft()
+        engine = sudoku_solver.CandidateEngine((board, horizontal_dots, vertical_dots), puzzle)
+        if sudoku_solver.PROPAGATION and not sudoku_solver.propagate(engine, range(cells)):
+            continue
+        if engine.empty_count == 0:
+            solutions.append([line[:] for line in engine.board])
+            continue
+        if engine.buckets[0]:
+            continue
+
+        row, column = sudoku_solver.select_variable(engine)
+        index = row * puzzle.size + column
+        for value in sudoku_solver.order_values(engine, index, engine.domains[index], rng):
+            child = [line[:] for line in engine.board]
+            child[row][column] = value
+            frontier.append(child)
+
+    subproblems.extend(frontier)
+    return subproblems, solutions
+
+
+def _init_worker(options, horizontal_dots, vertical_dots, stop):
+    """
+    Set the solver options of a worker process and compile the dots once
+    """
+    batch_solver._init_worker(*options)
+    _WORKER["dots"] = (horizontal_dots, vertical_dots)
+    _WORKER["puzzle"] = sudoku_solver.CompiledPuzzle(horizontal_dots, vertical_dots, sudoku_solver.NEGATIVE_CONSTRAINT)
+    _WORKER["stop"] = stop
+
+
+def solve_subproblem(task):
+    """
+    Search one subproblem, stopping early when another worker set the stop event
+    :param task: (position, board, node_limit, deadline, count_limit) tuple
+    :return: dictionary with the position, status, solutions and search statistics of the subproblem
+    """
+    position, board, node_limit, deadline, count_limit = task
+    horizontal_dots, vertical_dots = _WORKER["dots"]
+    limits = sudoku_solver.SearchLimits(node_limit, deadline, PollingToken(_WORKER["stop"]))
+    board_data = (board, horizontal_dots, vertical_dots)
+    result = sudoku_solver.solve_uncached(board_data, _WORKER["puzzle"], limits, count_limit)
+    if result.solutions is not None:
+        solutions = result.solutions
+    else:
+        solutions = [result.solution] if result.solution else []
+    return {"position": position, "status": result.status, "solutions": solutions, "stats": result.stats.to_dict()}
+
+
+def solve(board_data, puzzle=None, limits=None, count_limit=None, processes=None, split_factor=SPLIT_FACTOR):
+    """
+    Solve a single puzzle on a process pool: the top of the search tree is split into subproblems that the
+    workers take one at a time, and every worker stops as soon as one finds a solution, or when counting,
+    as soon as the solutions found together reach the count limit. Same interface as sudoku_solver.solve
+    :param board_data: board and dots data, the board is filled in place when the puzzle is solved
+        and left with its givens otherwise
+    :param puzzle: CompiledPuzzle to reuse, compiled from board_data when not given
+    :param limits: SearchLimits of the search, or None for an unbounded search. The deadline and the
+        cancellation token apply to the whole search, the node limit to every subproblem
+    :param count_limit: when given, count the solutions of every subproblem and add them up to this number
+    :param processes: number of worker processes, the number of cores when not given
+    :param split_factor: number of subproblems per worker process
+    :return: a SolveResult with the solution and the statistics of all the workers added up
+    """
+    start = time.perf_counter()
+    if puzzle is None:
+        puzzle = sudoku_solver.compile_puzzle(board_data)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    board = board_data[0]
+    node_limit = limits.node_limit if limits is not None else None
+    deadline = limits.deadline if limits is not None else None
+    cancel_token = limits.cancel_token if limits is not None else None
+
+    subproblems, solutions = split_puzzle(board_data, puzzle, processes * split_factor)
+    stats = sudoku_solver.SearchStats()
+    status = "solved" if solutions else "unsatisfiable"
+    wanted = 1 if count_limit is None else count_limit
+    stopped = []
+
+    if subproblems and len(solutions) < wanted:
+        options = (
+            sudoku_solver.FORWARD_CHECKING, sudoku_solver.PROPAGATION, sudoku_solver.NEGATIVE_CONSTRAINT,
+            sudoku_solver.ENGINE, sudoku_solver.BACKJUMPING, sudoku_solver.NOGOOD_LIMIT, None, None,
+            sudoku_solver.VALUE_ORDER, sudoku_solver.RANDOM_SEED, sudoku_solver.RESTART_UNIT
+        )
+        stop = multiprocessing.Event()
+        tasks = [
+            (position, subproblem, node_limit, deadline, count_limit)
+            for position, subproblem in enumerate(subproblems)
+        ]
+        pool = multiprocessing.Pool(
+            processes, initializer=_init_worker, initargs=(options, board_data[1], board_data[2], stop)
+        )
+        if cancel_token is not None:
+            # The workers only see the shared event, which is set when the caller cancels
+            def watch():
+                while not stop.wait(CANCEL_WATCH_INTERVAL):
+                    if cancel_token.is_set():
+                        stop.set()
+
+            threading.Thread(target=watch, daemon=True).start()
+        try:
+            for result in pool.imap_unordered(solve_subproblem, tasks, 1):
+                for name, value in result["stats"].items():
+                    if name == "max_depth":
+                        stats.max_depth = max(stats.max_depth, value)
+                    elif name != "total_time":
+                        setattr(stats, name, getattr(stats, name) + value)
+                solutions.extend(result["solutions"])
+                if result["status"] != "solved" and result["status"] != "unsatisfiable":
+                    stopped.append(result["status"])
+                if len(solutions) >= wanted:
+                    break
+        finally:
+            stop.set()
+            pool.terminate()
+            pool.join()
+
+    solutions = solutions[:wanted]
+    if stopped and len(solutions) < wanted:
+        # A stopped subproblem may hold more solutions, so a count short of the limit is not proven,
+        # the solutions found are kept as with a stopped counting search in sudoku_solver.solve_uncached
+        status = stopped[0] if count_limit is not None or not solutions else "solved"
+    elif solutions:
+        status = "solved"
+    if solutions:
+        for line, solution_line in zip(board, solutions[0]):
+            line[:] = solution_line
+    result = sudoku_solver.SolveResult(
+        status, board if solutions else False, stats, solutions=solutions if count_limit is not None else None
+    )
+    stats.total_time = time.perf_counter() - start
+    return result
@@ -0,0 +1,256 @@
+import os
+import sys
+import mmap
+import argparse
+
+import sudoku_solver
+
+
+# Compact format: one puzzle per line, the board values row by row (0 or '.' for an empty cell), then the
+# horizontal dots row by row and the vertical dots row by row (0 for none, 1 for white, 2 for black), without
+# separators. A 9x9 puzzle is 81 + 72 + 72 = 225 characters. Values above 9 are written as letters (A for 10).
+# Blank lines and lines starting with '#' are skipped.
+VALUE_CHARACTERS = "0123456789ABCDEFG"
+CHARACTER_VALUES = dict(
+    [(character, value) for value, character in enumerate(VALUE_CHARACTERS)]
+    + [(character.lower(), value) for value, character in enumerate(VALUE_CHARACTERS)]
+    + [(".", 0)]
+)
+
+# Size of the output buffer of SolutionWriter in characters
+WRITE_BUFFER_SIZE = 1 << 16
+
+
+def compact_size(length):
+    """
+    Find the grid size of a compact puzzle from its length
+    :param length: number of characters of the puzzle, size^2 values and 2 * size * (size - 1) dots
+    :return: the size of the grid
+    """
+    for size in range(1, sudoku_solver.MAX_SIZE + 1):
+        if size * size + 2 * size * (size - 1) == length:
+            return size
+    raise ValueError(f"A compact puzzle of {length} characters does not match any grid size")
+
+
+def is_compact(text):
+    """
+    :return: whether the text of a puzzle is in the compact format rather than the input format
+    """
+    text = text.strip()
+    return bool(text) and len(text.split()) == 1
+
+
+def encode_values(rows):
+    """
+    Encode a 2D list of values or dots as one line of characters
+    """
+    return "".join(VALUE_CHARACTERS[value] for row in rows for value in row)
+
+
+def decode_values(line, start, rows, columns):
+    """
+    Decode a block of a compact line into a 2D list
+    :param line: the compact line
+    :param start: position of the first character of the block
+    :param rows: number of rows of the block
+    :param columns: number of columns of the block
+    :return: the 2D list of values
+    """
+    try:
+        values = [CHARACTER_VALUES[character] for character in line[start:start + rows * columns]]
+    except KeyError as error:
+        raise ValueError(f"Invalid character {error} in compact puzzle")
+    return [values[row * columns:(row + 1) * columns] for row in range(rows)]
+
+
+def encode_puzzle(board_data):
+    """
+    Encode a puzzle in the compact format
+    :param board_data: board and dots information
+    :return: the puzzle as a single line without its line break
+    """
+    board, horizontal_dots, vertical_dots = board_data
+    return encode_values(board) + encode_values(horizontal_dots) + encode_values(vertical_dots)
+
+
+def decode_puzzle(line):
+    """
+    Decode a puzzle from the compact format
+    :param line: the puzzle as a single line
+    :return: the board, horizontal_dots, and vertical_dots as a tuple
+    """
+    line = line.strip()
+    size = compact_size(len(line))
+    board = decode_values(line, 0, size, size)
+    horizontal_dots = decode_values(line, size * size, size, size - 1)
+    vertical_dots = decode_values(line, size * size + size * (size - 1), size - 1, size)
+    return board, horizontal_dots, vertical_dots
+
+
+def parse_puzzle(text):
+    """
+    Parse the text of a puzzle in either the compact format or the input format
+    :return: the board, horizontal_dots, and vertical_dots as a tuple
+    """
+    if is_compact(text):
+        return decode_puzzle(text)
+    return sudoku_solver.parse_input(text)
+
+
+def puzzle_to_text(board_data):
+    """
+    Write a puzzle in the input format of the Inputs folder
+    :param board_data: board and dots information
+    :return: the board, horizontal dots and vertical dots blocks separated by blank lines
+    """
+    return "\n\n".join("\n".join(" ".join(str(value) for value in row) for row in rows) for rows in board_data) + "\n"
+
+
+def iter_lines(file_path):
+    """
+    Stream the puzzle lines of a compact file, memory-mapped when the file allows it
+    :param file_path: the path of the file
+    :return: generator of the (line number, line) tuples of the puzzles
+    """
+    with open(file_path, "rb") as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and pipes cannot be mapped, they are read through the file buffer
+            data = None
+        lines = file if data is None else iter(data.readline, b"")
+        try:
+            for number, line in enumerate(lines, 1):
+                line = line.strip()
+                if line and not line.startswith(b"#"):
+                    yield number, line.decode("ascii")
+        finally:
+            if data is not None:
+                data.close()
+
+
+def read_puzzles(file_path):
+    """
+    Stream the puzzles of a compact file without loading the whole file
+    :param file_path: the path of the file
+    :return: generator of the (line number, board_data) tuples of the puzzles
+    """
+    for number, line in iter_lines(file_path):
+        yield number, decode_puzzle(line)
+
+
+class SolutionWriter:
+    """
+    Buffered writer of solutions in the compact format: one line of size^2 values per puzzle,
+    or '-' for a puzzle without a solution. Lines are joined in memory and written in large blocks.
+    """
+
+    def __init__(self, file_path, buffer_size=WRITE_BUFFER_SIZE):
+        """
+        :param file_path: the path of the output file
+        :param buffer_size: number of characters kept in memory before writing them out
+        """
+        self.file = open(file_path, "w")
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered = 0
+        self.count = 0
+
+    def write(self, solution):
+        """
+        Add the solution of the next puzzle
+        :param solution: the solved board, or None when the puzzle has no solution
+        """
+        line = encode_values(solution) if solution else "-"
+        self.buffer.append(line)
+        self.buffered += len(line) + 1
+        self.count += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write out the buffered lines
+        """
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+            self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def convert_to_compact(source, file_path):
+    """
+    Convert puzzles in the input format to a compact file
+    :param source: a directory, a glob pattern or a multi-puzzle file, see batch_solver.iter_puzzles
+    :param file_path: the path of the compact file
+    :return: the number of puzzles written
+    """
+    import batch_solver
+
+    count = 0
+    with open(file_path, "w") as file:
+        for name, text in batch_solver.iter_puzzles(source):
+            file.write(encode_puzzle(parse_puzzle(text)) + "\n")
+            count += 1
+    return count
+
+
+def convert_from_compact(file_path, folder):
+    """
+    Convert a compact file to one file in the input format per puzzle, named after the compact file and the line
+    :param file_path: the path of the compact file
+    :param folder: the folder of the converted files, created if needed
+    :return: the number of puzzles written
+    """
+    os.makedirs(folder, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    count = 0
+    for number, board_data in read_puzzles(file_path):
+        with open(os.path.join(folder, f"{stem}_{number}.txt"), "w") as file:
+            file.write(puzzle_to_text(board_data))
+        count += 1
+    return count
+
+
+def main(argv=None):
+    """
+    Main method to convert puzzles between the input format and the compact format.
+    """
+    parser = argparse.ArgumentParser(description="Convert Kropki Sudoku puzzles to and from the compact format.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    to_compact = subparsers.add_parser("to-compact", help="Convert puzzles in the input format to a compact file")
+    to_compact.add_argument("source", type=str, help="Directory, glob pattern or multi-puzzle file to convert")
+    to_compact.add_argument("output_file", type=str, help="Compact file to write")
+    from_compact = subparsers.add_parser(
+        "from-compact", help="Convert a compact file to one file in the input format per puzzle"
+    )
+    from_compact.add_argument("input_file", type=str, help="Compact file to convert")
+    from_compact.add_argument("folder", type=str, help="Folder of the converted files")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "to-compact":
+            count = convert_to_compact(args.source, args.output_file)
+            print(f"Converted {count} puzzles to '{args.output_file}'")
+        else:
+            count = convert_from_compact(args.input_file, args.folder)
+            print(f"Converted {count} puzzles to '{args.folder}'")
+    except ValueError as error:
+        print(f"Could not convert the puzzles: {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import os
+import sys
+import random
+import argparse
+import itertools
+import time
+import contextlib
+import multiprocessing
+
+import sudoku_solver
+import puzzle_format
+
+
+# Solver settings of every phase of the generation: the grid is filled by a randomized search with restarts,
+# the uniqueness checks use the fastest inference, and puzzles are graded by the nodes of the plain
+# forward checking search, which propagation would flatten to a single node for most puzzles
+FILL_SETTINGS = {
+    "FORWARD_CHECKING": True, "PROPAGATION": False, "BACKJUMPING": False, "NOGOOD_LIMIT": 0,
+    "ENGINE": "backtracking", "VALUE_ORDER": "random", "RESTART_UNIT": 100, "NEGATIVE_CONSTRAINT": False,
+}
+CHECK_SETTINGS = {
+    "FORWARD_CHECKING": True, "PROPAGATION": True, "BACKJUMPING": False, "NOGOOD_LIMIT": 0,
+    "ENGINE": "backtracking", "VALUE_ORDER": "ascending", "RESTART_UNIT": 0,
+}
+GRADE_SETTINGS = dict(CHECK_SETTINGS, PROPAGATION=False)
+
+# Node budget of a uniqueness check, a removal whose check runs out of it is undone
+CHECK_NODE_LIMIT = 20000
+
+# Grades of the puzzles by the nodes of the grading search, the last grade takes every puzzle above the others
+GRADES = (("easy", 100), ("medium", 1000), ("hard", 10000), ("expert", None))
+
+# Node budget of the grading search, a puzzle that runs out of it is graded with the budget
+GRADE_NODE_LIMIT = 100000
+
+# Number of puzzles sent to a worker at once
+GENERATE_CHUNKSIZE = 1
+
+
+@contextlib.contextmanager
+def use_settings(settings):
+    """
+    Set solver options of sudoku_solver for the duration of a with block, restoring their values afterwards
+    :param settings: dictionary of the values of sudoku_solver globals
+    """
+    saved = {name: getattr(sudoku_solver, name) for name in settings}
+    try:
+        for name, value in settings.items():
+            setattr(sudoku_solver, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(sudoku_solver, name, value)
+
+
+def random_dot(value, other, rng):
+    """
+    Find the dot between two adjacent values of a solution, either one between 1 and 2
+    :return: 0 for no dot, 1 for a white dot or 2 for a black dot
+    """
+    white = abs(value - other) == 1
+    black = value == other * 2 or other == value * 2
+    if white and black:
+        return rng.choice((1, 2))
+    return 1 if white else 2 if black else 0
+
+
+def solution_dots(solution, rng):
+    """
+    Derive every white and black dot of a solved grid
+    :param solution: the solved board as a 2D list
+    :param rng: random.Random generator choosing the dot between 1 and 2
+    :return: the horizontal_dots and vertical_dots as a tuple
+    """
+    size = len(solution)
+    horizontal_dots = [
+        [random_dot(line[column], line[column + 1], rng) for column in range(size - 1)] for line in solution
+    ]
+    vertical_dots = [
+        [random_dot(solution[row][column], solution[row + 1][column], rng) for column in range(size)]
+        for row in range(size - 1)
+    ]
+    return horizontal_dots, vertical_dots
+
+
+def fill_grid(size, rng):
+    """
+    Fill an empty grid by a search with a random value order and Luby restarts, so every solved grid can come out.
+    The dots are derived from the grid afterwards, so the negative constraint does not apply to it
+    :param size: number of rows of the grid
+    :param rng: random.Random generator seeding the search
+    :return: the solved board as a 2D list
+    """
+    board = [[0] * size for _ in range(size)]
+    with use_settings(dict(FILL_SETTINGS, RANDOM_SEED=rng.getrandbits(64))):
+        result = sudoku_solver.solve_uncached((board, [[0] * (size - 1) for _ in range(size)],
+                                               [[0] * size for _ in range(size - 1)]))
+    if result.status != "solved":
+        raise ValueError(f"Could not fill a {size}x{size} grid")
+    return result.solution
+
+
+def has_unique_solution(board_data, puzzle):
+    """
+    Check that a puzzle has exactly one solution within CHECK_NODE_LIMIT nodes
+    :param board_data: board and dots data, left unchanged
+    :param puzzle: CompiledPuzzle of the dots
+    :return: whether the search proved the solution unique
+    """
+    board = [line[:] for line in board_data[0]]
+    limits = sudoku_solver.SearchLimits(CHECK_NODE_LIMIT)
+    result = sudoku_solver.solve_uncached((board, board_data[1], board_data[2]), puzzle, limits, 2)
+    return result.is_unique()
+
+
+def grade(nodes):
+    """
+    :return: the name of the grade of a puzzle needing this many nodes in the grading search
+    """
+    for name, limit in GRADES:
+        if limit is None or nodes <= limit:
+            return name
+
+
+def generate_puzzle(size, seed, number, negative_constraint=False, keep_dots=False):
+    """
+    Generate one puzzle with a unique solution: fill a grid, derive all its dots, then remove the givens
+    and the dots in a random order, each as long as the solution stays unique. Under the negative constraint
+    the dots are always kept, since a missing dot is information there
+    :param size: number of rows of the grid
+    :param seed: seed of the generator, the puzzle only depends on the seed, the size and the number
+    :param number: number of the puzzle
+    :param negative_constraint: whether the puzzle is solved under the negative constraint
+    :param keep_dots: whether to keep every dot and only remove givens
+    :return: dictionary with the number, board_data, solution, givens, dots, grading nodes and grade of the puzzle
+    """
+    rng = random.Random(f"{seed}:{size}:{number}")
+    solution = fill_grid(size, rng)
+    horizontal_dots, vertical_dots = solution_dots(solution, rng)
+    board = [line[:] for line in solution]
+    board_data = (board, horizontal_dots, vertical_dots)
+
+    removals = [("cell", row, column) for row in range(size) for column in range(size)]
+    if not (keep_dots or negative_constraint):
+        removals += [("horizontal", row, column) for row in range(size) for column in range(size - 1)
+                     if horizontal_dots[row][column]]
+        removals += [("vertical", row, column) for row in range(size - 1) for column in range(size)
+                     if vertical_dots[row][column]]
+    rng.shuffle(removals)
+
+    with use_settings(dict(CHECK_SETTINGS, NEGATIVE_CONSTRAINT=negative_constraint)):
+        puzzle = sudoku_solver.compile_puzzle(board_data)
+        for kind, row, column in removals:
+            if kind == "cell":
+                board[row][column] = 0
+                if not has_unique_solution(board_data, puzzle):
+                    board[row][column] = solution[row][column]
+                continue
+            # Removing a dot changes the compiled constraints, they are compiled again
+            dots = horizontal_dots if kind == "horizontal" else vertical_dots
+            dot = dots[row][column]
+            dots[row][column] = 0
+            candidate = sudoku_solver.compile_puzzle(board_data)
+            if has_unique_solution(board_data, candidate):
+                puzzle = candidate
+            else:
+                dots[row][column] = dot
+
+    with use_settings(dict(GRADE_SETTINGS, NEGATIVE_CONSTRAINT=negative_constraint)):
+        limits = sudoku_solver.SearchLimits(GRADE_NODE_LIMIT)
+        board_copy = [line[:] for line in board]
+        result = sudoku_solver.solve_uncached((board_copy, horizontal_dots, vertical_dots), puzzle, limits)
+    return {
+        "number": number,
+        "board_data": board_data,
+        "solution": solution,
+        "givens": sum(1 for line in board for value in line if value),
+        "dots": sum(1 for dots in (horizontal_dots, vertical_dots) for line in dots for dot in line if dot),
+        "nodes": result.stats.nodes,
+        "grade": grade(result.stats.nodes),
+    }
+
+
+def _generate_task(task):
+    """
+    Generate the puzzle of a (size, seed, number, negative_constraint, keep_dots) task in a worker process
+    """
+    return generate_puzzle(*task)
+
+
+def generate_puzzles(count, size=9, seed=0, processes=None, negative_constraint=False, keep_dots=False, grades=None):
+    """
+    Generate puzzles on a process pool, every puzzle numbered and generated independently of the others
+    :param count: number of puzzles to generate
+    :param size: number of rows of the grid
+    :param seed: seed of the generator, the same seed gives the same puzzles in the same order
+    :param processes: number of worker processes, the number of cores when not given
+    :param negative_constraint: whether the puzzles are solved under the negative constraint
+    :param keep_dots: whether to keep every dot and only remove givens
+    :param grades: names of the grades to keep, the puzzles of the other grades are dropped and replaced
+        by new ones, or None to keep every puzzle
+    :return: generator of the dictionaries of generate_puzzle in number order
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    tasks = ((size, seed, number, negative_constraint, keep_dots) for number in itertools.count(1))
+    kept = 0
+
+    if processes == 1:
+        results = map(_generate_task, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_generate_task, tasks, GENERATE_CHUNKSIZE)
+    try:
+        for result in results:
+            if grades is not None and result["grade"] not in grades:
+                continue
+            yield result
+            kept += 1
+            if kept >= count:
+                return
+    finally:
+        if pool is not None:
+            # The pool is still working ahead on puzzles that are not needed
+            pool.terminate()
+            pool.join()
+
+
+def puzzle_name(result):
+    """
+    :return: the file name of a generated puzzle in the input format, with its size, number and grade
+    """
+    size = len(result["solution"])
+    return f"generated_{size}x{size}_{result['number']:05d}_{result['grade']}.txt"
+
+
+def main(argv=None):
+    """
+    Main method to generate puzzles with a unique solution.
+    """
+    parser = argparse.ArgumentParser(description="Generate Kropki Sudoku puzzles with a unique solution.")
+    parser.add_argument("count", type=int, help="Number of puzzles to generate")
+    parser.add_argument(
+        "output", type=str,
+        help="Folder of the puzzles in the input format, one file per puzzle, or the compact file with --compact"
+    )
+    parser.add_argument("-s", "--size", type=int, default=9, help="Number of rows of the grid")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator")
+    parser.add_argument("-j", "--processes", type=int, help="Number of worker processes (default: number of cores)")
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Write the puzzles to a single file in the compact format, each after a comment with its grade"
+    )
+    parser.add_argument(
+        "--grades", nargs="+", choices=[name for name, _ in GRADES],
+        help="Only keep the puzzles of these grades, generating more until there are enough"
+    )
+    parser.add_argument("--keep-dots", action="store_true", help="Keep every dot of the solution, only remove givens")
+    parser.add_argument(
+        "-n", "--negative-constraint", action="store_true",
+        help="Generate puzzles for the negative constraint, every dot of the solution is kept"
+    )
+    args = parser.parse_args(argv)
+    if not 2 <= args.size <= sudoku_solver.MAX_SIZE:
+        parser.error(f"--size must be between 2 and {sudoku_solver.MAX_SIZE}")
+
+    start = time.time()
+    puzzles = generate_puzzles(
+        args.count, args.size, args.seed, args.processes, args.negative_constraint, args.keep_dots, args.grades
+    )
+    counts = {}
+    if args.compact:
+        output = open(args.output, "w")
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        output = None
+    try:
+        for result in puzzles:
+            counts[result["grade"]] = counts.get(result["grade"], 0) + 1
+            if output is not None:
+                output.write(f"# {result['number']} {result['grade']} nodes={result['nodes']}\n")
+                output.write(puzzle_format.encode_puzzle(result["board_data"]) + "\n")
+            else:
+                with open(os.path.join(args.output, puzzle_name(result)), "w") as file:
+                    file.write(puzzle_format.puzzle_to_text(result["board_data"]))
+    except ValueError as error:
+        print(f"Could not generate the puzzles: {error}")
+        sys.exit(1)
+    finally:
+        if output is not None:
+            output.close()
+
+    end = time.time()
+    print(", ".join(f"{name}: {counts[name]}" for name, _ in GRADES if name in counts))
+    print(f"Puzzles saved to '{args.output}'")
+    print(f"Total time taken: {round(end - start, 2)} seconds ({round(args.count / (end - start), 2)} puzzles/second)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# The 8 geometric symmetries of the grid (rotations and reflections). They are applied to the
+# board and to both dot grids together, so the white and black dot structure is kept.
+# Every symmetry maps a cell (row, column) of an n x n grid to its new position.
+SYMMETRIES = (
+    ("identity", lambda row, column, n: (row, column)),
+    ("rotate_90", lambda row, column, n: (column, n - 1 - row)),
+    ("rotate_180", lambda row, column, n: (n - 1 - row, n - 1 - column)),
+    ("rotate_270", lambda row, column, n: (n - 1 - column, row)),
+    ("flip_horizontal", lambda row, column, n: (row, n - 1 - column)),
+    ("flip_vertical", lambda row, column, n: (n - 1 - row, column)),
+    ("transpose", lambda row, column, n: (column, row)),
+    ("anti_transpose", lambda row, column, n: (n - 1 - column, n - 1 - row)),
+)
+SYMMETRY_NAMES = tuple(name for name, _ in SYMMETRIES)
+
+# Index of the symmetry undoing each symmetry
+INVERSES = (0, 3, 2, 1, 4, 5, 6, 7)
+
+
+def transform_board(board, symmetry):
+    """
+    Apply a symmetry to a board
+    :param board: square 2D list of values
+    :param symmetry: index of the symmetry in SYMMETRIES
+    :return: the transformed board as a new 2D list
+    """
+    n = len(board)
+    mapping = SYMMETRIES[symmetry][1]
+    transformed = [[0] * n for _ in range(n)]
+    for row in range(n):
+        for column in range(n):
+            new_row, new_column = mapping(row, column, n)
+            transformed[new_row][new_column] = board[row][column]
+    return transformed
+
+
+def transform_dots(horizontal_dots, vertical_dots, n, symmetry):
+    """
+    Apply a symmetry to the dots, which can move from the horizontal to the vertical grid
+    :param horizontal_dots: dots between horizontally adjacent cells
+    :param vertical_dots: dots between vertically adjacent cells
+    :param n: size of the grid
+    :param symmetry: index of the symmetry in SYMMETRIES
+    :return: the transformed horizontal_dots and vertical_dots as new 2D lists
+    """
+    mapping = SYMMETRIES[symmetry][1]
+    new_horizontal = [[0] * (n - 1) for _ in range(n)]
+    new_vertical = [[0] * n for _ in range(n - 1)]
+
+    def place(first, second, dot):
+        (row, column), (other_row, other_column) = sorted((first, second))
+        if row == other_row:
+            new_horizontal[row][column] = dot
+        else:
+            new_vertical[row][column] = dot
+
+    for row in range(n):
+        for column in range(n - 1):
+            place(mapping(row, column, n), mapping(row, column + 1, n), horizontal_dots[row][column])
+    for row in range(n - 1):
+        for column in range(n):
+            place(mapping(row, column, n), mapping(row + 1, column, n), vertical_dots[row][column])
+
+    return new_horizontal, new_vertical
+
+
+def transform_puzzle(board_data, symmetry):
+    """
+    Apply a symmetry to a whole puzzle
+    :param board_data: board and dots information
+    :param symmetry: index of the symmetry in SYMMETRIES
+    :return: the transformed board, horizontal_dots, and vertical_dots as a tuple
+    """
+    board = transform_board(board_data[0], symmetry)
+    horizontal_dots, vertical_dots = transform_dots(board_data[1], board_data[2], len(board), symmetry)
+    return board, horizontal_dots, vertical_dots
+
+
+def box_symmetries(box_rows, box_columns):
+    """
+    Find the symmetries that map every box of a grid onto a box, so the transformed puzzle has the same rules.
+    Quarter turns and transpositions swap the rows and columns of the boxes, so they only keep square boxes
+    :param box_rows: number of rows of a box
+    :param box_columns: number of columns of a box
+    :return: tuple of the indices in SYMMETRIES of the symmetries keeping the boxes
+    """
+    n = box_rows * box_columns
+    kept = []
+    for symmetry, (_, mapping) in enumerate(SYMMETRIES):
+        box_images = {}
+        for row in range(n):
+            for column in range(n):
+                new_row, new_column = mapping(row, column, n)
+                box = (row // box_rows, column // box_columns)
+                box_images.setdefault(box, set()).add((new_row // box_rows, new_column // box_columns))
+        if all(len(images) == 1 for images in box_images.values()):
+            kept.append(symmetry)
+    return tuple(kept)
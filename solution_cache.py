@@ -0,0 +1,224 @@
+import time
+import sqlite3
+from operator import itemgetter
+
+import sudoku_solver
+import puzzle_format
+from puzzle_symmetry import INVERSES, box_symmetries, transform_puzzle
+
+
+# Number of puzzles kept in a cache when no capacity is given
+DEFAULT_CAPACITY = 100000
+
+# Number of cache hits whose new recency is kept in memory before it is written to the store in one transaction
+USED_FLUSH_SIZE = 256
+
+# Fraction of the capacity evicted at once when the store grows above it, so the next inserts do not evict
+EVICTION_FRACTION = 0.05
+
+# Permutations of the compact encoding of every grid size, set by symmetry_permutations
+_PERMUTATIONS = {}
+
+
+def symmetry_permutations(size):
+    """
+    Find how the symmetries keeping the boxes of a grid move the characters of the compact encoding of a puzzle,
+    computed once per grid size by transforming a puzzle whose every cell and dot holds its own position
+    :param size: number of rows of the grid
+    :return: dictionary of the symmetries to a (puzzle, board) tuple of permutations of the compact encoding of
+        a puzzle and of a board, each an itemgetter taking for every position of the transformed encoding
+        the character at the position it comes from
+    """
+    if size not in _PERMUTATIONS:
+        cells = size * size
+        board = [[row * size + column for column in range(size)] for row in range(size)]
+        horizontal_dots = [[cells + row * (size - 1) + column for column in range(size - 1)] for row in range(size)]
+        vertical_dots = [[cells * 2 - size + row * size + column for column in range(size)] for row in range(size - 1)]
+        permutations = {}
+        for symmetry in box_symmetries(*sudoku_solver.box_shape(size)):
+            blocks = transform_puzzle((board, horizontal_dots, vertical_dots), symmetry)
+            positions = [position for block in blocks for line in block for position in line]
+            permutations[symmetry] = (itemgetter(*positions), itemgetter(*positions[:cells]))
+        _PERMUTATIONS[size] = permutations
+    return _PERMUTATIONS[size]
+
+
+def canonical_form(board_data):
+    """
+    Find the canonical form of a puzzle: the smallest compact encoding among its images under the
+    symmetries that keep the boxes of the grid (all 8 rotations and reflections for square boxes)
+    :param board_data: board and dots information
+    :return: the canonical encoding and the index in SYMMETRIES of the symmetry giving it, as a tuple
+    """
+    line = puzzle_format.encode_puzzle(board_data)
+    best = None
+    for symmetry, (permutation, _) in symmetry_permutations(len(board_data[0])).items():
+        key = "".join(permutation(line))
+        if best is None or key < best[0]:
+            best = (key, symmetry)
+    return best
+
+
+class SolutionCache:
+    """
+    On-disk store of solved puzzles keyed by their canonical form, so a puzzle is solved once for all its
+    rotations and reflections. The store is an SQLite table holding at most capacity puzzles, the least
+    recently used ones are evicted first. Unsatisfiable puzzles are stored too, searches stopped by a limit are not.
+
+    A hit does not write to the store: the new recency of the puzzle is kept in memory and written with the
+    next store, every USED_FLUSH_SIZE hits, or when the cache is closed. The number of stored puzzles is
+    counted along the inserts, and once it is above the capacity, the oldest puzzles are evicted down to
+    EVICTION_FRACTION of the capacity below it, so an insert only rarely evicts.
+    """
+
+    def __init__(self, file_path, capacity=DEFAULT_CAPACITY):
+        """
+        Open the store, creating it when needed
+        :param file_path: the path of the SQLite file, or ":memory:" for a cache that is not kept
+        :param capacity: maximum number of puzzles kept
+        """
+        self.capacity = capacity
+        self.eviction_batch = max(1, int(capacity * EVICTION_FRACTION))
+        self.hits = 0
+        self.misses = 0
+        # Concurrent batch workers share the file, a locked store is waited for
+        self.connection = sqlite3.connect(file_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution TEXT NOT NULL, used INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+        self.connection.commit()
+        # Recency of the hits not written yet, by key
+        self.used = {}
+        self.count = len(self)
+        self.inserts = 0
+
+    def _key(self, board_data):
+        """
+        :return: the canonical key of a puzzle under the current rules and the symmetry giving it
+        """
+        key, symmetry = canonical_form(board_data)
+        # The negative constraint changes the solutions of a puzzle, so it is part of the key
+        if sudoku_solver.NEGATIVE_CONSTRAINT:
+            key += "n"
+        return key, symmetry
+
+    def lookup(self, board_data):
+        """
+        Find the solution of a puzzle in the store, in the orientation of the puzzle
+        :param board_data: board and dots information
+        :return: the solved board, False for a puzzle known to be unsatisfiable, or None when the puzzle is not stored
+        """
+        return self._fetch(*self._key(board_data), len(board_data[0]))
+
+    def _fetch(self, key, symmetry, size):
+        """
+        Find a stored solution by its canonical key and map it back to the orientation of the puzzle
+        """
+        row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # The clock is shared by every process using the store without a query
+        self.used[key] = time.time_ns()
+        if len(self.used) >= USED_FLUSH_SIZE:
+            with self.connection:
+                self._flush()
+        if row[0] == "-":
+            return False
+        solution = "".join(symmetry_permutations(size)[INVERSES[symmetry]][1](row[0]))
+        return puzzle_format.decode_values(solution, 0, size, size)
+
+    def _flush(self):
+        """
+        Write the recency of the hits kept in memory, within the transaction of the caller
+        """
+        if self.used:
+            self.connection.executemany(
+                "UPDATE solutions SET used = ? WHERE key = ?", [(used, key) for key, used in self.used.items()]
+            )
+            self.used.clear()
+
+    def store(self, board_data, solution):
+        """
+        Store the solution of a puzzle, evicting the least recently used puzzles above the capacity
+        :param board_data: board and dots information, with only the givens on the board
+        :param solution: the solved board, or False for an unsatisfiable puzzle
+        """
+        self._put(*self._key(board_data), solution)
+
+    def _put(self, key, symmetry, solution):
+        """
+        Store a solution in the canonical orientation under its canonical key
+        """
+        if solution:
+            size = len(solution)
+            value = "".join(symmetry_permutations(size)[symmetry][1](puzzle_format.encode_values(solution)))
+        else:
+            value = "-"
+        with self.connection:
+            self._flush()
+            self.used.pop(key, None)
+            updated = self.connection.execute(
+                "UPDATE solutions SET solution = ?, used = ? WHERE key = ?", (value, time.time_ns(), key)
+            )
+            if updated.rowcount:
+                return
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions (key, solution, used) VALUES (?, ?, ?)", (key, value, time.time_ns())
+            )
+            self.count += 1
+            self.inserts += 1
+            # The other processes sharing the store insert too, the count is taken again before evicting
+            # and after every batch of inserts so it does not drift far from the store
+            if self.count <= self.capacity and self.inserts < self.eviction_batch:
+                return
+            self.count = len(self)
+            self.inserts = 0
+            if self.count > self.capacity:
+                evicted = self.count - self.capacity + self.eviction_batch
+                self.connection.execute(
+                    "DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY used LIMIT ?)", (evicted,)
+                )
+                self.count -= evicted
+
+    def solve(self, board_data, puzzle=None, limits=None):
+        """
+        Solve a puzzle through the cache, with the same interface as sudoku_solver.solve without counting
+        :param board_data: board and dots data, the board is filled in place when the puzzle is solved
+        :param puzzle: CompiledPuzzle to reuse, compiled from board_data when not given
+        :param limits: SearchLimits of the search, or None for an unbounded search
+        :return: a SolveResult, with empty statistics on a cache hit
+        """
+        key, symmetry = self._key(board_data)
+        cached = self._fetch(key, symmetry, len(board_data[0]))
+        if cached is None:
+            result = sudoku_solver.solve_uncached(board_data, puzzle, limits)
+            if result.status == "solved" or result.status == "unsatisfiable":
+                self._put(key, symmetry, result.solution)
+            return result
+
+        stats = sudoku_solver.SearchStats()
+        if not cached:
+            return sudoku_solver.SolveResult("unsatisfiable", False, stats)
+        board = board_data[0]
+        for line, solution_line in zip(board, cached):
+            line[:] = solution_line
+        return sudoku_solver.SolveResult("solved", board, stats)
+
+    def counters(self):
+        """
+        :return: the hit and miss counters and the number of stored puzzles as a dictionary
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def close(self):
+        with self.connection:
+            self._flush()
+        self.connection.close()
@@ -0,0 +1,178 @@
+import sudoku_solver
+from sudoku_solver import ASSIGNED, CandidateEngine, SearchStats, SolveResult, backtrack, forward_check, propagate
+
+
+# Kinds of the dot grids of set_dot
+DOT_KINDS = ("horizontal", "vertical")
+
+
+class SolverSession:
+    """
+    Puzzle kept open across edits of one given or one dot at a time, for interactive clients.
+
+    The session keeps the compiled dots, the root state of the search (the givens with every cell and domain
+    reduction that propagation deduces from them) and the last solution found. An edit only throws away what it
+    invalidates: a new given is propagated into the root state from its cell, any other edit rebuilds the root
+    state on the next request (a given edit reuses the compiled dots), and the last solution is kept as long as
+    it still satisfies the edited puzzle, in which case solve answers without searching.
+    The search below the root state uses the solver settings of sudoku_solver, without restarts.
+    """
+
+    def __init__(self, board_data):
+        """
+        Open a session on a puzzle
+        :param board_data: board and dots data, copied so the session does not share them
+        """
+        board, horizontal_dots, vertical_dots = board_data
+        self.givens = [line[:] for line in board]
+        self.horizontal_dots = [line[:] for line in horizontal_dots]
+        self.vertical_dots = [line[:] for line in vertical_dots]
+        self.puzzle = sudoku_solver.compile_puzzle(self.board_data)
+        self.solution = None
+        self.reused = 0
+        self._engine = None
+        self._consistent = True
+
+    @property
+    def board_data(self):
+        """
+        :return: the givens and dots of the puzzle as edited, as a (board, horizontal_dots, vertical_dots) tuple
+        """
+        return self.givens, self.horizontal_dots, self.vertical_dots
+
+    def _root(self):
+        """
+        Find the root state of the search, building and propagating it from the givens when an edit discarded it
+        :return: the CandidateEngine of the root state
+        """
+        if self._engine is None:
+            board = [line[:] for line in self.givens]
+            engine = CandidateEngine((board, self.horizontal_dots, self.vertical_dots), self.puzzle)
+            self._consistent = (
+                engine.givens_consistent and not engine.buckets[0] and propagate(engine, range(self.puzzle.cells))
+            )
+            self._engine = engine
+        return self._engine
+
+    def set_value(self, row, column, value):
+        """
+        Set or clear a given
+        :param row: row of the cell
+        :param column: column of the cell
+        :param value: the new given, 0 to clear the cell
+        """
+        if not 0 <= value <= self.puzzle.size:
+            raise ValueError(f"Value {value} is out of range for a {self.puzzle.size}x{self.puzzle.size} grid")
+        old = self.givens[row][column]
+        if old == value:
+            return
+        self.givens[row][column] = value
+        if self.solution and value and self.solution[row][column] != value:
+            self.solution = None
+
+        engine = self._engine
+        if engine is None or old or not value:
+            # Clearing or changing a given relaxes the puzzle, what was deduced from the old given no longer holds
+            self._engine = None
+            return
+        if not self._consistent:
+            return
+
+        # A new given only adds a constraint, so it is propagated into the root state from its cell
+        index = row * self.puzzle.size + column
+        if engine.values[index]:
+            self._consistent = engine.values[index] == value
+            return
+        if not engine.domains[index] >> value & 1:
+            self._consistent = False
+            return
+        mark = len(engine.trail)
+        engine.assign(index, value)
+        engine.trail.append((index, ASSIGNED))
+        self._consistent = forward_check(engine, row, column, value) and propagate(
+            engine, [other for other, _ in engine.trail[mark + 1:]]
+        )
+
+    def set_dot(self, kind, row, column, dot):
+        """
+        Set or clear a dot
+        :param kind: "horizontal" for the dot right of the cell, "vertical" for the dot below it
+        :param row: row of the cell
+        :param column: column of the cell
+        :param dot: 0 for no dot, 1 for a white dot or 2 for a black dot
+        """
+        if kind not in DOT_KINDS:
+            raise ValueError(f"Unknown dot kind '{kind}', expected one of {', '.join(DOT_KINDS)}")
+        if dot not in (0, 1, 2):
+            raise ValueError(f"Invalid dot {dot}, expected 0, 1 or 2")
+        dots = self.horizontal_dots if kind == "horizontal" else self.vertical_dots
+        if dots[row][column] == dot:
+            return
+        dots[row][column] = dot
+        # The dot tables are compiled again, the root state is rebuilt on them on the next request
+        self.puzzle = sudoku_solver.compile_puzzle(self.board_data)
+        self._engine = None
+        if self.solution and not sudoku_solver.check_solution(self.board_data, self.solution):
+            self.solution = None
+
+    def solve(self, limits=None):
+        """
+        Find a solution of the puzzle as edited, the last solution when it still holds
+        :param limits: SearchLimits of the search, or None for an unbounded search
+        :return: a SolveResult with a copy of the solution, with empty statistics when no search was needed
+        """
+        if self.solution:
+            self.reused += 1
+            return SolveResult("solved", [line[:] for line in self.solution], SearchStats())
+
+        engine = self._root()
+        stats = SearchStats()
+        if not self._consistent:
+            return SolveResult("unsatisfiable", False, stats)
+
+        # The search runs on the root state and is undone afterwards: the trail takes back the prunings
+        # and the propagated cells, and the decisions are the cells left that were empty at the root
+        root_stats = engine.stats
+        engine.stats = stats
+        mark = len(engine.trail)
+        empty = [index for index in range(self.puzzle.cells) if engine.values[index] == 0]
+        status = backtrack((engine.board, self.horizontal_dots, self.vertical_dots), engine, limits=limits)
+        board = [line[:] for line in engine.board]
+        engine.undo(mark)
+        for index in empty:
+            if engine.values[index]:
+                engine.unassign(index)
+        engine.stats = root_stats
+
+        if status == "solved":
+            self.solution = board
+            return SolveResult(status, [line[:] for line in board], stats)
+        if status == "unsatisfiable":
+            self._consistent = False
+            return SolveResult(status, False, stats)
+        return SolveResult(status, False, stats, board)
+
+    def hint(self, limits=None):
+        """
+        Find the next step for a player: a cell that propagation fixes from the givens alone, or when
+        there is none, the value of the solution in the cell the search would branch on first (MRV, then degree)
+        :param limits: SearchLimits of the search needed when propagation fixes no cell
+        :return: (row, column, value, deduced) tuple, deduced being False when the value comes from the solution,
+            or None when the puzzle is complete, unsatisfiable or the search stopped
+        """
+        engine = self._root()
+        if not self._consistent:
+            return None
+        size = self.puzzle.size
+        for index in range(self.puzzle.cells):
+            row, column = divmod(index, size)
+            if engine.values[index] and not self.givens[row][column]:
+                return row, column, engine.values[index], True
+        if engine.empty_count == 0:
+            return None
+
+        row, column = sudoku_solver.select_variable(engine)
+        result = self.solve(limits)
+        if not result.solution:
+            return None
+        return row, column, result.solution[row][column], False
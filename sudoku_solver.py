@@ -1,51 +1,86 @@
 import os
+import sys
 import copy
-import logging
 import argparse
-import difflib
+import collections
+import json
 import time
+import random
 from datetime import datetime
 
 
 FORWARD_CHECKING = False
+PROPAGATION = False
+NEGATIVE_CONSTRAINT = False
 
+# Conflict-directed backjumping, with a store of up to NOGOOD_LIMIT learned nogoods (0 to learn none)
+BACKJUMPING = False
+NOGOOD_LIMIT = 0
 
-log_folder = "Logs"
-os.makedirs(log_folder, exist_ok=True)
-log_file = os.path.join(log_folder, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
+# Search engine: "backtracking" (MRV and degree heuristics) or "dlx" (exact cover with dancing links)
+ENGINES = ("backtracking", "dlx")
+ENGINE = "backtracking"
 
-logging.basicConfig(
-    filename=log_file,
-    filemode='w',
-    level=logging.INFO,
-    format="%(message)s"
-)
+# Order in which the values of a cell are tried: "ascending", "lcv" (least constraining value first),
+# "dot" (values with the most compatible dot partners first) or "random" (shuffled with RANDOM_SEED)
+VALUE_ORDERS = ("ascending", "lcv", "dot", "random")
+VALUE_ORDER = "ascending"
+RANDOM_SEED = None
 
+# Restart the search after budgets of RESTART_UNIT nodes times the Luby sequence (0 for no restarts)
+RESTART_UNIT = 0
 
-def log_board_differences(prev_board, curr_board):
+# SolutionCache answering the solves that do not count solutions, or None to always search
+SOLUTION_CACHE = None
+
+
+LOG_FOLDER = "Logs"
+
+TRACE_LEVELS = ("off", "decisions", "full")
+TRACE_OFF = 0
+TRACE_DECISIONS = 1
+TRACE_FULL = 2
+
+
+class SearchTracer:
     """
-    Log the differences between the previous board and the current board.
-    :param prev_board: The previous state of the board
-    :param curr_board: The current state of the board
+    Bounded in-memory ring buffer of search events. An event is only recorded when the
+    trace level asks for it, and is only formatted when the buffer is written out, so the
+    search pays a single level check per event when tracing is off.
     """
-    if prev_board is None:
-        logging.info("No previous board to compare. This is the initial state.")
-        return
 
-    differences = []
-    for row in range(len(curr_board)):
-        for col in range(len(curr_board[row])):
-            if prev_board[row][col] != curr_board[row][col]:
-                differences.append(
-                    f"Cell ({row}, {col}): {prev_board[row][col]} -> {curr_board[row][col]}"
-                )
+    def __init__(self, level=TRACE_OFF, capacity=100000):
+        """
+        :param level: TRACE_OFF, TRACE_DECISIONS (assignments and backtracks) or TRACE_FULL (every search step)
+        :param capacity: number of events kept, the oldest ones are dropped first
+        """
+        self.level = level
+        self.events = collections.deque(maxlen=capacity)
 
-    if differences:
-        logging.info("Changes detected:")
-        for diff in differences:
-            logging.info(diff)
-    else:
-        logging.info("No changes detected.")
+    def record(self, message, *args):
+        """
+        Record an event, its message is formatted with the arguments when the buffer is written out
+        """
+        self.events.append((message, args))
+
+    def dump(self, file_path=None):
+        """
+        Write the recorded events to a log file
+        :param file_path: the path of the log file, a timestamped file in the Logs folder when not given
+        :return: the path of the log file
+        """
+        if file_path is None:
+            file_path = os.path.join(LOG_FOLDER, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
+        folder = os.path.dirname(file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(file_path, "w") as file:
+            for message, args in self.events:
+                print(message.format(*args), file=file)
+        return file_path
+
+
+TRACER = SearchTracer()
 
 
 def process_input(file_path):
@@ -54,282 +89,580 @@ def process_input(file_path):
     :param file_path: the path of the file
     :return: the board, horizontal_dots, and vertical_dots as a tuple
     """
-    logging.info(f"Processing input file: {file_path}")
     try:
         file = open(file_path, "r")
     except FileNotFoundError:
-        logging.error(f"File not found: {file_path}")
         print(f"File not found: {file_path}")
         return
 
     content = file.read()
-    content = content.split("\n\n")
     file.close()
 
+    return parse_input(content)
+
+
+def parse_input(content):
+    """
+    Parse the text of a puzzle into the correct format
+    :param content: the board, horizontal dots and vertical dots blocks separated by blank lines
+    :return: the board, horizontal_dots, and vertical_dots as a tuple
+    """
+    content = content.split("\n\n")
+
     board = []
     board_temp = content[0].split("\n")
     for line in board_temp:
+        if not line.strip():
+            continue
         curr_row = [int(elem) for elem in line.split()]
         board.append(curr_row)
 
     horizontal_dots = []
     dots_temp = content[1].split("\n")
     for line in dots_temp:
+        if not line.strip():
+            continue
         curr_row = [int(elem) for elem in line.split()]
         horizontal_dots.append(curr_row)
 
     vertical_dots = []
     dots_temp = content[2].split("\n")
     for line in dots_temp:
+        if not line.strip():
+            continue
         curr_row = [int(elem) for elem in line.split()]
         vertical_dots.append(curr_row)
 
-    logging.info("Input file processed successfully")
     return board, horizontal_dots, vertical_dots
 
 
-def check_assignment_complete(board):
+# Largest supported grid size, the domains are tabulated for every mask of the values 1 to size
+MAX_SIZE = 16
+
+
+class ValueTables:
     """
-    Check whether the board is fully assigned
-    :param board: The current board to check
-    :return: boolean of whether the board assignment is complete
+    Mask tables of the values 1 to size of a grid: bit v of a mask is set when the value v is
+    (still) possible, bit 0 is unused. They are built once per grid size, see value_tables.
     """
-    for row in board:
-        for elem in row:
-            if elem == 0:
-                logging.info(f"Board assignment complete? No")
-                return False
-    logging.info(f"Board assignment complete? Yes")
-    return True
-
 
-def find_remaining_value(board_data, row, column):
-    """
-    Find the remaining possibilities for a given index on the board
-    :param board_data: board and dots information
-    :param row: row value to check
-    :param column: column value to check
-    :return: list of all possible remaining values
-    """
-    logging.info(f"Finding remaining values for position ({row}, {column}).")
-    remaining_values = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-
-    board = board_data[0]
-    horizontal_dots = board_data[1]
-    vertical_dots = board_data[2]
-
-    # Check horizontal dots
-    if column != 8 and horizontal_dots[row][column] != 0:  # Right dot
-        if board[row][column + 1] != 0:
-            total_numbers_allowed = []
-            if horizontal_dots[row][column] == 1:
-                number_allowed_lower = board[row][column + 1] - 1
-                if 10 > number_allowed_lower > 0 and number_allowed_lower in remaining_values:
-                    total_numbers_allowed.append(number_allowed_lower)
-                number_allowed_higher = board[row][column + 1] + 1
-                if 10 > number_allowed_higher > 0 and number_allowed_higher in remaining_values:
-                    total_numbers_allowed.append(number_allowed_higher)
+    def __init__(self, size):
+        self.size = size
+        self.digits = range(1, size + 1)
+        self.full_mask = (1 << (size + 1)) - 2
+
+        # Every mask is its lowest value followed by the values of the mask without it
+        mask_values = [()]
+        for mask in range(1, self.full_mask + 1):
+            lowest = (mask & -mask).bit_length() - 1
+            if lowest == 0:
+                mask_values.append(mask_values[mask - 1])
             else:
-                number_allowed_half = board[row][column + 1] / 2
-                if 10 > number_allowed_half > 0 and number_allowed_half % 1 == 0 and number_allowed_half in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_half))
-                number_allowed_double = board[row][column + 1] * 2
-                if 10 > number_allowed_double > 0 and number_allowed_double % 1 == 0 and number_allowed_double in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_double))
-
-            if total_numbers_allowed:
-                # Set the remaining values to just the numbers that satisfies the constraints
-                remaining_values = total_numbers_allowed
-            else:  # Dot constraint fails
-                return []
-
-    if column != 0 and horizontal_dots[row][column - 1] != 0:  # Left dot
-        if board[row][column - 1] != 0:
-            total_numbers_allowed = []
-            if horizontal_dots[row][column - 1] == 1:
-                number_allowed_lower = board[row][column - 1] - 1
-                if 10 > number_allowed_lower > 0 and number_allowed_lower in remaining_values:
-                    total_numbers_allowed.append(number_allowed_lower)
-                number_allowed_higher = board[row][column - 1] + 1
-                if 10 > number_allowed_higher > 0 and number_allowed_higher in remaining_values:
-                    total_numbers_allowed.append(number_allowed_higher)
-            else:
-                number_allowed_half = board[row][column - 1] / 2
-                if 10 > number_allowed_half > 0 and number_allowed_half % 1 == 0 and number_allowed_half in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_half))
-                number_allowed_double = board[row][column - 1] * 2
-                if 10 > number_allowed_double > 0 and number_allowed_double % 1 == 0 and number_allowed_double in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_double))
-
-            if total_numbers_allowed:
-                # Set the remaining values to just the numbers that satisfies the constraints
-                remaining_values = total_numbers_allowed
-            else:  # Dot constraint fails
-                return []
-
-    # Check vertical dots
-    if row != 8 and vertical_dots[row][column] != 0:  # Bottom dot
-        if board[row + 1][column] != 0:
-            total_numbers_allowed = []
-            if vertical_dots[row][column] == 1:
-                    number_allowed_lower = board[row + 1][column] - 1
-                    if 10 > number_allowed_lower > 0 and number_allowed_lower in remaining_values:
-                        total_numbers_allowed.append(number_allowed_lower)
-                    number_allowed_higher = board[row + 1][column] + 1
-                    if 10 > number_allowed_higher > 0 and number_allowed_higher in remaining_values:
-                        total_numbers_allowed.append(number_allowed_higher)
-            else:
-                number_allowed_half = board[row + 1][column] / 2
-                if 10 > number_allowed_half > 0 and number_allowed_half % 1 == 0 and number_allowed_half in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_half))
-                number_allowed_double = board[row + 1][column] * 2
-                if 10 > number_allowed_double > 0 and number_allowed_double % 1 == 0 and number_allowed_double in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_double))
-
-            if total_numbers_allowed:
-                # Set the remaining values to just the numbers that satisfies the constraints
-                remaining_values = total_numbers_allowed
-            else:  # Dot constraint fails
-                return []
-
-    if row != 0 and vertical_dots[row - 1][column] != 0:  # Upper dot
-        if board[row - 1][column] != 0:
-            total_numbers_allowed = []
-            if vertical_dots[row - 1][column] == 1:
-                number_allowed_lower = board[row - 1][column] - 1
-                if 10 > number_allowed_lower > 0 and number_allowed_lower in remaining_values:
-                    total_numbers_allowed.append(number_allowed_lower)
-                number_allowed_higher = board[row - 1][column] + 1
-                if 10 > number_allowed_higher > 0 and number_allowed_higher in remaining_values:
-                    total_numbers_allowed.append(number_allowed_higher)
-            else:
-                number_allowed_half = board[row - 1][column] / 2
-                if 10 > number_allowed_half > 0 and number_allowed_half % 1 == 0 and number_allowed_half in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_half))
-                number_allowed_double = board[row - 1][column] * 2
-                if 10 > number_allowed_double > 0 and number_allowed_double % 1 == 0 and number_allowed_double in remaining_values:
-                    total_numbers_allowed.append(int(number_allowed_double))
-
-            if total_numbers_allowed:
-                # Set the remaining values to just the numbers that satisfies the constraints
-                remaining_values = total_numbers_allowed
-            else:  # Dot constraint fails
-                return []
-
-    # Check board
-
-    block_row_start = (row // 3) * 3
-    block_row_end = block_row_start + 2
-    block_column_start = (column // 3) * 3
-    block_column_end = block_column_start + 2
-
-    for row_index in range(9):
-        for column_index in range(9):
-            board_number = board[row_index][column_index]
-            # Check row
-            if row_index == row:
-                if board_number in remaining_values:
-                    remaining_values.remove(board_number)
-            # Check column
-            if column_index == column:
-                if board_number in remaining_values:
-                    remaining_values.remove(board_number)
-            # Check block:
-            if block_row_start <= row_index <= block_row_end and block_column_start <= column_index <= block_column_end:
-                if board_number in remaining_values:
-                    remaining_values.remove(board_number)
-
-    logging.info(f"\tRemaining values for ({row}, {column}): {remaining_values}")
-    return remaining_values
-
-
-def find_board_MRV(board_data):
-    """
-    Find the MRVs and remaining value matrix of the board
-    :param board_data: board and the dots locations
-    :return: All the MRV indexes and the remaining values matrix
-    """
-    logging.info("==========Finding MRVs for the board.==========")
-    board = board_data[0]
-    remaining_values_matrix = []
-
-    for row in range(9):
-        remaining_values_line = []
-        for column in range(9):
-            if board[row][column] == 0:
-                remaining_values_line.append(find_remaining_value(board_data, row, column))
-            else:
-                remaining_values_line.append("")
-        remaining_values_matrix.append(remaining_values_line)
+                mask_values.append((lowest,) + mask_values[mask & (mask - 1)])
+        self.mask_values = tuple(mask_values)
+        self.mask_sizes = tuple(len(values) for values in self.mask_values)
+
+        # Indexed by the dot value of the input format (0 for none, 1 for white, 2 for black) and then by the
+        # neighbour value. Without a dot, the negative constraint forbids both relations.
+        white_dot_masks = self._dot_masks(lambda value, other: abs(value - other) == 1)
+        black_dot_masks = self._dot_masks(lambda value, other: value == other * 2 or other == value * 2)
+        no_dot_masks = [self.full_mask & ~(white | black) for white, black in zip(white_dot_masks, black_dot_masks)]
+        self.dot_masks = (no_dot_masks, white_dot_masks, black_dot_masks)
+        self.dot_support = tuple(self._dot_support(masks) for masks in self.dot_masks)
+
+    def _dot_masks(self, relation):
+        """
+        Build the dot compatibility masks for a dot relation
+        :param relation: function taking two values and returning whether they satisfy the dot
+        :return: list where index v holds the mask of every value compatible with v
+        """
+        masks = [0]
+        for value in self.digits:
+            mask = 0
+            for other in self.digits:
+                if relation(value, other):
+                    mask |= 1 << other
+            masks.append(mask)
+        return masks
+
+    def _dot_support(self, masks):
+        """
+        Build the support table of a dot for arc consistency
+        :param masks: dot compatibility masks
+        :return: tuple where index m holds the mask of every value compatible with at least one value of the mask m
+        """
+        support = [0]
+        for mask in range(1, self.full_mask + 1):
+            lowest = (mask & -mask).bit_length() - 1
+            support.append(support[mask & (mask - 1)] | (masks[lowest] if lowest else 0))
+        return tuple(support)
+
+
+_VALUE_TABLES = {}
+
+
+def value_tables(size):
+    """
+    Find the mask tables of a grid size, building them on first use
+    :param size: number of values of the grid
+    :return: the ValueTables of the size
+    """
+    if size not in _VALUE_TABLES:
+        if not 1 <= size <= MAX_SIZE:
+            raise ValueError(f"Grids of size {size} are not supported (sizes 1 to {MAX_SIZE} are)")
+        _VALUE_TABLES[size] = ValueTables(size)
+    return _VALUE_TABLES[size]
+
+
+def box_shape(size):
+    """
+    Find the box shape of a grid: the most square rectangle of size cells, with no more rows than columns
+    (2x2 boxes for a 4x4 grid, 2x3 for 6x6, 3x3 for 9x9 and 4x4 for 16x16)
+    :param size: number of rows of the grid
+    :return: the number of rows and columns of a box as a tuple
+    """
+    box_rows = max(rows for rows in range(1, int(size ** 0.5) + 1) if size % rows == 0)
+    return box_rows, size // box_rows
+
+
+# Trail entry of a cell assigned by propagation, undone by unassigning the cell
+ASSIGNED = -1
+
+
+class CompiledPuzzle:
+    """
+    Static layout of a puzzle, built once from the dots so the hot paths of the search
+    only walk precomputed flat indexes (row * size + column). It does not depend on the
+    givens, so it can be reused for repeated solves of boards sharing the same dots.
+
+    The grid size comes from the dots and the box shape from the grid size (see box_shape),
+    and the mask tables of the grid size are shared by every puzzle of that size.
+
+    With the negative constraint, every pair of adjacent cells without a dot also becomes
+    a dot edge of type 0, so it is enforced everywhere the white and black dots are.
+    """
+
+    def __init__(self, horizontal_dots, vertical_dots, negative_constraint=False):
+        """
+        Build the peer and dot tables
+        :param horizontal_dots: dots between horizontally adjacent cells
+        :param vertical_dots: dots between vertically adjacent cells
+        :param negative_constraint: whether adjacent cells without a dot are neither consecutive nor in a 1:2 ratio
+        """
+        size = len(horizontal_dots)
+        if any(len(line) != size - 1 for line in horizontal_dots) or len(vertical_dots) != size - 1 or any(
+            len(line) != size for line in vertical_dots
+        ):
+            raise ValueError(f"The dots do not match a {size}x{size} grid")
+        tables = value_tables(size)
+        cells = size * size
+        self.horizontal_dots = horizontal_dots
+        self.vertical_dots = vertical_dots
+        self.negative_constraint = negative_constraint
+        self.size = size
+        self.cells = cells
+        self.box_rows, self.box_columns = box_shape(size)
+        self.full_mask = tables.full_mask
+        self.digits = tables.digits
+        self.mask_values = tables.mask_values
+        self.mask_sizes = tables.mask_sizes
+        self.dot_masks = tables.dot_masks
+        self.dot_support = tables.dot_support
+
+        self.rows = tuple(index // size for index in range(cells))
+        self.columns = tuple(index % size for index in range(cells))
+        boxes_per_row = size // self.box_columns
+        self.boxes = tuple(
+            (index // size // self.box_rows) * boxes_per_row + (index % size) // self.box_columns
+            for index in range(cells)
+        )
+
+        # The rows, columns and boxes as tuples of indexes
+        self.units = (
+            tuple(tuple(row * size + column for column in range(size)) for row in range(size))
+            + tuple(tuple(row * size + column for row in range(size)) for column in range(size))
+            + tuple(tuple(index for index in range(cells) if self.boxes[index] == box) for box in range(size))
+        )
+        self.peers = tuple(
+            tuple(
+                other for other in range(cells)
+                if other != index and (
+                    self.rows[other] == self.rows[index]
+                    or self.columns[other] == self.columns[index]
+                    or self.boxes[other] == self.boxes[index]
+                )
+            )
+            for index in range(cells)
+        )
+
+        # Every dot as an (index, other index, dot) edge, and the same edges seen from each cell
+        dot_edges = []
+        for row in range(size):
+            for column in range(size):
+                index = row * size + column
+                if column != size - 1 and (horizontal_dots[row][column] != 0 or negative_constraint):
+                    dot_edges.append((index, index + 1, horizontal_dots[row][column]))
+                if row != size - 1 and (vertical_dots[row][column] != 0 or negative_constraint):
+                    dot_edges.append((index, index + size, vertical_dots[row][column]))
+        self.dot_edges = tuple(dot_edges)
+
+        dot_neighbours = [[] for _ in range(cells)]
+        degree_dependents = [[] for _ in range(cells)]
+        for index, other, dot in self.dot_edges:
+            dot_neighbours[index].append((other, dot))
+            dot_neighbours[other].append((index, dot))
+            if dot == 0:
+                continue
+            # Like the original degree heuristic, a dot towards the last column or row is not counted
+            towards_last = self.columns[other] == size - 1 if other == index + 1 else self.rows[other] == size - 1
+            if not towards_last:
+                degree_dependents[other].append(index)
+            degree_dependents[index].append(other)
+        self.dot_neighbours = tuple(tuple(sorted(neighbours)) for neighbours in dot_neighbours)
+        self.degree_dependents = tuple(tuple(dependents) for dependents in degree_dependents)
+
+
+class SearchStats:
+    """
+    Counters and per-phase timings (in seconds) of a search.
+
+    forward_check_prunings counts the candidates removed by forward checking after every assignment, only when
+    FORWARD_CHECKING is set: the domains are pruned the same way in every mode to keep the MRV buckets up to date,
+    but without forward checking the pruning does not cut the search and is not counted. The dancing links engine
+    counts the choices its dots remove instead. propagation_prunings counts the removals of propagation.
+
+    selection_time covers the choice of the next cell and the ordering of its values, candidate_time the building
+    of the candidate engine and the domain pruning after every assignment (in every mode, see above),
+    propagation_time the propagation before and during the search, and total_time the whole solve,
+    parsing and output excluded
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.forward_check_prunings = 0
+        self.propagation_prunings = 0
+        self.propagated_cells_before_search = 0
+        self.propagated_cells = 0
+        self.backjumps = 0
+        self.nogoods_learned = 0
+        self.nogood_prunings = 0
+        self.restarts = 0
+        self.selection_time = 0.0
+        self.candidate_time = 0.0
+        self.propagation_time = 0.0
+        self.total_time = 0.0
+
+    def to_dict(self):
+        """
+        :return: the statistics as a JSON serializable dictionary
+        """
+        return dict(vars(self))
+
+
+class SearchLimits:
+    """
+    Budgets of a search, checked at every node: a number of nodes, a wall-clock deadline
+    (a time.time() timestamp) and a cancellation token, any object with an is_set method
+    such as a threading.Event or a multiprocessing.Event
+    """
+
+    def __init__(self, node_limit=None, deadline=None, cancel_token=None):
+        self.node_limit = node_limit
+        self.deadline = deadline
+        self.cancel_token = cancel_token
+
+    @classmethod
+    def from_time_limit(cls, node_limit=None, time_limit=None, cancel_token=None):
+        """
+        Build the limits of a search starting now
+        :param time_limit: number of seconds the search may run, or None
+        """
+        deadline = time.time() + time_limit if time_limit is not None else None
+        return cls(node_limit, deadline, cancel_token)
+
+    def check(self, nodes):
+        """
+        Check the budgets of the search
+        :param nodes: number of nodes expanded so far
+        :return: "node_limit", "timeout" or "cancelled" when a limit is hit, None otherwise
+        """
+        if self.node_limit is not None and nodes >= self.node_limit:
+            return "node_limit"
+        if self.deadline is not None and time.time() >= self.deadline:
+            return "timeout"
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            return "cancelled"
+        return None
+
+
+class SolveResult:
+    """
+    Outcome of solve: the status ("solved", "unsatisfiable", or "node_limit", "timeout" and "cancelled"
+    when a SearchLimits stopped the search), the solved board (False when there is none), the board
+    reached when the search was stopped (None otherwise) and the SearchStats of the search.
+    When solutions are counted, solutions holds every solution found and solution_count their number
+    """
+
+    def __init__(self, status, solution, stats, partial=None, solutions=None):
+        self.status = status
+        self.solution = solution
+        self.stats = stats
+        self.partial = partial
+        self.solutions = solutions
+        if solutions is not None:
+            self.solution_count = len(solutions)
+        else:
+            self.solution_count = 1 if solution else 0
+
+    def is_unique(self):
+        """
+        :return: whether the search proved that the puzzle has exactly one solution,
+            which needs solutions to be counted with a count_limit of at least 2
+        """
+        return self.solutions is not None and self.status == "solved" and self.solution_count == 1
+
+    def to_dict(self):
+        """
+        :return: the result as a JSON serializable dictionary
+        """
+        return {
+            "status": self.status, "solution": self.solution or None, "partial": self.partial,
+            "solution_count": self.solution_count, "solutions": self.solutions, "stats": self.stats.to_dict()
+        }
+
+
+def compile_puzzle(board_data, negative_constraint=None):
+    """
+    Compile the layout of a puzzle
+    :param board_data: board and dots information, as returned by process_input
+    :param negative_constraint: whether to enforce the negative constraint, NEGATIVE_CONSTRAINT when not given
+    :return: the CompiledPuzzle of the dots
+    """
+    if negative_constraint is None:
+        negative_constraint = NEGATIVE_CONSTRAINT
+    puzzle = CompiledPuzzle(board_data[1], board_data[2], negative_constraint)
+    if len(board_data[0]) != puzzle.size or any(len(line) != puzzle.size for line in board_data[0]):
+        raise ValueError(f"The board does not match the {puzzle.size}x{puzzle.size} grid of the dots")
+    return puzzle
+
+
+class CandidateEngine:
+    """
+    Keep track of the values used by every row, column and box as bitmasks, so the
+    candidates of a cell can be found with a few AND/OR operations instead of a board scan.
+    The masks are updated incrementally through assign and unassign.
+
+    The domain of every cell is also kept across search levels. Every pruning pushes the
+    old domain on a trail, so backtracking only has to pop the changes made since a mark.
+    Cells assigned by constraint propagation are recorded on the same trail.
 
-    MRV_index_list = []
-    min_length = 10
+    For variable selection, the empty cells are kept in buckets keyed by domain size,
+    along with the number of empty cells of every row, column and box and the number of
+    empty dot neighbours of every cell, which make up the degree heuristic.
 
-    # Find MRV length
-    for row in range(9):
-        for column in range(9):
-            if remaining_values_matrix[row][column] != "" and len(remaining_values_matrix[row][column]) < min_length:
-                min_length = len(remaining_values_matrix[row][column])
+    Cells are addressed by their flat index (row * size + column) in the CompiledPuzzle.
+
+    givens_consistent tells whether the values on the board when the engine was built keep the rules between
+    them: no value repeated in a row, column or box and no dot broken by two adjacent values. The domains only
+    look at the empty cells, so a board failing this check must not be searched.
+    """
 
-    # Get index of all position that have the minimum length
-    for row in range(9):
-        for column in range(9):
-            if len(remaining_values_matrix[row][column]) == min_length:
-                MRV_index_list.append((row, column))
+    def __init__(self, board_data, puzzle=None, stats=None):
+        """
+        Build the masks, domains and selection buckets from the given board
+        :param board_data: board and dots information
+        :param puzzle: CompiledPuzzle of the dots, compiled from board_data when not given
+        :param stats: SearchStats to update during the search, a new one when not given
+        """
+        if puzzle is None:
+            puzzle = compile_puzzle(board_data)
+        self.puzzle = puzzle
+        self.stats = stats if stats is not None else SearchStats()
+        self.mask_sizes = puzzle.mask_sizes
+        size = puzzle.size
+        cells = puzzle.cells
+        self.board = board_data[0]
+        self.values = [value for line in self.board for value in line]
+        self.row_masks = [0] * size
+        self.column_masks = [0] * size
+        self.box_masks = [0] * size
+        self.row_empty = [0] * size
+        self.column_empty = [0] * size
+        self.box_empty = [0] * size
+        self.empty_count = 0
+        self.dot_degrees = [0] * cells
+
+        self.givens_consistent = True
+        for index in range(cells):
+            value = self.values[index]
+            if value != 0:
+                if (self.row_masks[puzzle.rows[index]] | self.column_masks[puzzle.columns[index]]
+                        | self.box_masks[puzzle.boxes[index]]) >> value & 1:
+                    self.givens_consistent = False
+                self._mark(index, 1 << value)
+            else:
+                self._count_empty(index, 1)
+                for dependent in puzzle.degree_dependents[index]:
+                    self.dot_degrees[dependent] += 1
+        values = self.values
+        for index, other, dot in puzzle.dot_edges:
+            if values[index] and values[other] and not puzzle.dot_masks[dot][values[index]] >> values[other] & 1:
+                self.givens_consistent = False
+
+        self.domains = [0 if self.values[index] else self.candidate_mask(index) for index in range(cells)]
+        self.trail = []
+        self.buckets = [set() for _ in range(size + 1)]
+        for index in range(cells):
+            if self.values[index] == 0:
+                self.buckets[self.mask_sizes[self.domains[index]]].add(index)
+
+    def _mark(self, index, bit):
+        puzzle = self.puzzle
+        self.row_masks[puzzle.rows[index]] |= bit
+        self.column_masks[puzzle.columns[index]] |= bit
+        self.box_masks[puzzle.boxes[index]] |= bit
+
+    def _count_empty(self, index, change):
+        puzzle = self.puzzle
+        self.row_empty[puzzle.rows[index]] += change
+        self.column_empty[puzzle.columns[index]] += change
+        self.box_empty[puzzle.boxes[index]] += change
+        self.empty_count += change
+
+    def assign(self, index, value):
+        """
+        Put a value on the board and mark it as used in its row, column and box
+        """
+        puzzle = self.puzzle
+        self.values[index] = value
+        self.board[puzzle.rows[index]][puzzle.columns[index]] = value
+        self._mark(index, 1 << value)
+        self._count_empty(index, -1)
+        self.buckets[self.mask_sizes[self.domains[index]]].discard(index)
+        dot_degrees = self.dot_degrees
+        for dependent in puzzle.degree_dependents[index]:
+            dot_degrees[dependent] -= 1
+
+    def unassign(self, index):
+        """
+        Clear a cell of the board and free its value in its row, column and box
+        """
+        puzzle = self.puzzle
+        keep = ~(1 << self.values[index])
+        self.values[index] = 0
+        self.board[puzzle.rows[index]][puzzle.columns[index]] = 0
+        self.row_masks[puzzle.rows[index]] &= keep
+        self.column_masks[puzzle.columns[index]] &= keep
+        self.box_masks[puzzle.boxes[index]] &= keep
+        self._count_empty(index, 1)
+        self.buckets[self.mask_sizes[self.domains[index]]].add(index)
+        dot_degrees = self.dot_degrees
+        for dependent in puzzle.degree_dependents[index]:
+            dot_degrees[dependent] += 1
+
+    def candidate_mask(self, index):
+        """
+        Find the mask of the values that can still be placed in a cell
+        :param index: flat index of the cell to check
+        :return: bitmask of all possible remaining values
+        """
+        puzzle = self.puzzle
+        values = self.values
+        mask = puzzle.full_mask & ~(
+            self.row_masks[puzzle.rows[index]]
+            | self.column_masks[puzzle.columns[index]]
+            | self.box_masks[puzzle.boxes[index]]
+        )
+
+        # Every assigned neighbour across a dot restricts the cell to its compatible values
+        for other, dot in puzzle.dot_neighbours[index]:
+            if values[other] != 0:
+                mask &= puzzle.dot_masks[dot][values[other]]
+
+        return mask
+
+    def degree(self, index):
+        """
+        Find the degree heuristic of a cell: the empty cells of its row, column and box
+        (the cell itself included) plus its empty dot neighbours
+        """
+        puzzle = self.puzzle
+        return (
+            self.row_empty[puzzle.rows[index]]
+            + self.column_empty[puzzle.columns[index]]
+            + self.box_empty[puzzle.boxes[index]]
+            + self.dot_degrees[index]
+        )
+
+    def smallest_bucket(self):
+        """
+        Find the empty cells with the fewest remaining values
+        :return: set of flat indexes, empty if the board is complete
+        """
+        for bucket in self.buckets:
+            if bucket:
+                return bucket
+        return set()
 
-    logging.info(f"==========MRV indexes found: {MRV_index_list}==========")
-    return MRV_index_list, remaining_values_matrix
+    def prune(self, index, keep):
+        """
+        Restrict the domain of an empty cell, recording its old domain on the trail
+        :param keep: mask of the values that may stay in the domain
+        :return: the new domain mask
+        """
+        domain = self.domains[index]
+        if domain & keep != domain:
+            mask_sizes = self.mask_sizes
+            self.trail.append((index, domain))
+            self.buckets[mask_sizes[domain]].discard(index)
+            domain &= keep
+            self.domains[index] = domain
+            self.buckets[mask_sizes[domain]].add(index)
+        return domain
+
+    def undo(self, mark):
+        """
+        Pop the trail back to a mark, restoring every domain pruned and every cell assigned since then
+        :param mark: length of the trail to go back to
+        """
+        domains = self.domains
+        buckets = self.buckets
+        trail = self.trail
+        mask_sizes = self.mask_sizes
+        while len(trail) > mark:
+            index, domain = trail.pop()
+            if domain == ASSIGNED:
+                self.unassign(index)
+                continue
+            buckets[mask_sizes[domains[index]]].discard(index)
+            domains[index] = domain
+            buckets[mask_sizes[domain]].add(index)
+
+
+def find_board_MRV(engine):
+    """
+    Find the MRVs of the board from the domain size buckets of the engine
+    :param engine: candidate engine of the board
+    :return: All the MRV indexes in board order
+    """
+    size = engine.puzzle.size
+    MRV_index_list = sorted(divmod(index, size) for index in engine.smallest_bucket())
+    if TRACER.level >= TRACE_FULL:
+        TRACER.record("MRV indexes found: {}", MRV_index_list)
+    return MRV_index_list
 
 
-def find_board_degree_heuristic(board_data, MRV_index_list):
+def find_board_degree_heuristic(engine, MRV_index_list):
     """
     Find the degree heuristic for the board based on the MRV index list given
-    :param board_data: board and dots information
+    :param engine: candidate engine of the board
     :param MRV_index_list: list of indexes to check
     :return: A list with all index with minimum degree heuristics
     """
-    logging.info("Finding degree heuristic for the board.")
-    board = board_data[0]
-    horizontal_dots = board_data[1]
-    vertical_dots = board_data[2]
-
-    degree_heuristic_data = []
-    for row, column in MRV_index_list:
-        curr_count = 0
-
-        # Check horizontal dots
-        if column + 1 <= 7 and horizontal_dots[row][column] != 0 and board[row][column + 1] == 0:  # Right dot
-            curr_count += 1
-        if column - 1 >= 0 and horizontal_dots[row][column - 1] != 0 and board[row][column - 1] == 0:  # Left dot
-            curr_count += 1
-        if row + 1 <= 7 and vertical_dots[row][column] != 0 and board[row + 1][column] == 0:  # Bottom dot
-            curr_count += 1
-        if row - 1 >= 0 and vertical_dots[row - 1][column] != 0 and board[row - 1][column] == 0:  # Upper dot
-            curr_count += 1
-
-        # Check board
-        block_row_start = (row // 3) * 3
-        block_row_end = block_row_start + 2
-        block_column_start = (column // 3) * 3
-        block_column_end = block_column_start + 2
-
-        for row_index in range(9):
-            for column_index in range(9):
-                board_number = board[row_index][column_index]
-                # Check row
-                if row_index == row:
-                    if board_number == 0:
-                        curr_count += 1
-                # Check column
-                if column_index == column:
-                    if board_number == 0:
-                        curr_count += 1
-                # Check block:
-                if block_row_start <= row_index <= block_row_end and block_column_start <= column_index <= block_column_end:
-                    if board_number == 0:
-                        curr_count += 1
-
-        degree_heuristic_data.append(curr_count)
+    size = engine.puzzle.size
+    degree_heuristic_data = [engine.degree(row * size + column) for row, column in MRV_index_list]
 
     min_value = min(degree_heuristic_data)
     degree_heuristic_index_list = []
@@ -338,133 +671,647 @@ def find_board_degree_heuristic(board_data, MRV_index_list):
         if degree_heuristic_data[i] == min_value:
             degree_heuristic_index_list.append(MRV_index_list[i])
 
-    logging.info(f"All indexes with minimum degree heuristics: {degree_heuristic_index_list}")
+    if TRACER.level >= TRACE_FULL:
+        TRACER.record("All indexes with minimum degree heuristics: {}", degree_heuristic_index_list)
     return degree_heuristic_index_list
 
 
-def forward_check(board_data, row, column, value):
+def select_variable(engine):
+    """
+    Pick the next cell to branch on: MRV, then the degree heuristic, then board order
+    :param engine: candidate engine of a board with empty cells
+    :return: the row and column of the cell
+    """
+    MRV_index_list = find_board_MRV(engine)
+
+    # Degree Heuristic needed if 2+ variables
+    if len(MRV_index_list) > 1:
+        return find_board_degree_heuristic(engine, MRV_index_list)[0]
+    return MRV_index_list[0]
+
+
+def order_values(engine, index, domain, rng=None):
+    """
+    Order the values of a cell according to VALUE_ORDER. The lcv and dot orders break ties by value,
+    or randomly when a random generator is given
+    :param engine: candidate engine of the board
+    :param index: flat index of the cell
+    :param domain: domain mask of the cell
+    :param rng: random.Random generator, needed by the random order
+    :return: tuple of the values in the order they are tried
+    """
+    puzzle = engine.puzzle
+    mask_values = puzzle.mask_values
+    values = mask_values[domain]
+    if VALUE_ORDER == "ascending" or len(values) < 2:
+        return values
+    if VALUE_ORDER == "random":
+        values = list(values)
+        rng.shuffle(values)
+        return tuple(values)
+
+    domains = engine.domains
+    assigned = engine.values
+    mask_sizes = puzzle.mask_sizes
+    dot_masks = puzzle.dot_masks
+    scores = [0] * (puzzle.size + 1)
+    if VALUE_ORDER == "lcv":
+        # Number of candidates every value takes from the empty peers and dot neighbours, fewest first
+        for other in puzzle.peers[index]:
+            if assigned[other] == 0:
+                for value in mask_values[domains[other] & domain]:
+                    scores[value] += 1
+        for other, dot in puzzle.dot_neighbours[index]:
+            if assigned[other] == 0:
+                for value in values:
+                    scores[value] += mask_sizes[domains[other] & ~dot_masks[dot][value] & ~(1 << value)]
+    else:
+        # Number of candidates of the empty dot neighbours compatible with every value, most first
+        for other, dot in puzzle.dot_neighbours[index]:
+            if assigned[other] == 0:
+                for value in values:
+                    scores[value] -= mask_sizes[domains[other] & dot_masks[dot][value]]
+
+    if rng is None:
+        return tuple(sorted(values, key=lambda value: scores[value]))
+    return tuple(sorted(values, key=lambda value: (scores[value], rng.random())))
+
+
+def forward_check(engine, row, column, value):
     """
     Perform forward checking by pruning domains of neighbors based on the current assignment.
-    :param board_data: board and dots data
+    Every pruning is recorded on the trail of the engine, so it can be undone with restore_domains.
+    :param engine: candidate engine of the board
     :param row: row of the assigned value
     :param column: column of the assigned value
     :param value: the value being assigned
-    :return: a dictionary with original domains for rollback or False if a constraint fails
+    :return: True if every neighbor still has a value left, False if a constraint fails
     """
-    logging.info(f"==========Performing forward check for ({row}, {column}) with value {value}.==========")
-    board = board_data[0]
-    horizontal_dots = board_data[1]
-    vertical_dots = board_data[2]
-    domains_backup = {}
-
-    def prune_domain(r, c):
-        """
-        Prune the domain of a cell and backup the original domain.
-        """
-        if (r, c) not in domains_backup:
-            domains_backup[(r, c)] = find_remaining_value(board_data, r, c)
+    puzzle = engine.puzzle
+    index = row * puzzle.size + column
+    values = engine.values
+    keep = ~(1 << value)
+
+    # Row, column and block neighbors lose the assigned value
+    for other in puzzle.peers[index]:
+        if values[other] == 0 and not engine.prune(other, keep):  # If domain is empty, forward checking fails
+            if TRACER.level >= TRACE_FULL:
+                TRACER.record("Domain for {} became empty.", divmod(other, puzzle.size))
+            return False
 
-        current_domain = domains_backup[(r, c)][:]  # Copy the original domain
+    # Dot neighbors only keep the values compatible with the assigned one
+    for other, dot in puzzle.dot_neighbours[index]:
+        if values[other] == 0 and not engine.prune(other, puzzle.dot_masks[dot][value]):
+            if TRACER.level >= TRACE_FULL:
+                TRACER.record("Domain for {} became empty.", divmod(other, puzzle.size))
+            return False
 
-        if value in current_domain:
-            current_domain.remove(value)
-            logging.info(f"Pruned domain for ({r}, {c}): {current_domain}")
+    return True
 
-        if not current_domain:  # If domain is empty, forward checking fails
-            logging.warning(f"Domain for ({r}, {c}) became empty.")
-            return False
 
-        domains_backup[(r, c)] = current_domain
+def propagate(engine, queue):
+    """
+    Propagate the constraints until nothing changes anymore:
+    arc consistency on the white and black dot edges, naked singles (which make the row,
+    column and box all-different constraints arc consistent) and hidden singles.
+    Every change is recorded on the trail of the engine, so it can be undone with restore_domains.
+    :param engine: candidate engine of the board
+    :param queue: flat indexes of the cells whose domain changed
+    :return: True if the board is still consistent, False if a domain or a unit ran out of values
+    """
+    puzzle = engine.puzzle
+    domains = engine.domains
+    values = engine.values
+    stats = engine.stats
+    mask_values = puzzle.mask_values
+    dot_masks = puzzle.dot_masks
+    dot_support = puzzle.dot_support
+    full_mask = puzzle.full_mask
+    queue = list(queue)
+
+    def restrict(index, keep):
+        """
+        Prune the domain of an empty cell and queue it if it changed.
+        """
+        domain = domains[index]
+        if domain & keep != domain:
+            stats.propagation_prunings += 1
+            if not engine.prune(index, keep):
+                return False
+            queue.append(index)
         return True
 
-    # Check all neighbors and prune domains
-    for i in range(9):
-        if i != column and board[row][i] == 0:  # Row neighbors
-            if not prune_domain(row, i):
-                return False
-        if i != row and board[i][column] == 0:  # Column neighbors
-            if not prune_domain(i, column):
+    while True:
+        while queue:
+            index = queue.pop()
+            if values[index] != 0:
+                continue
+            domain = domains[index]
+            if not domain:
                 return False
 
-    # Block neighbors
-    block_row_start = (row // 3) * 3
-    block_col_start = (column // 3) * 3
-    for r in range(block_row_start, block_row_start + 3):
-        for c in range(block_col_start, block_col_start + 3):
-            if (r != row or c != column) and board[r][c] == 0:
-                if not prune_domain(r, c):
+            if engine.mask_sizes[domain] == 1:  # Naked single
+                value = mask_values[domain][0]
+                engine.assign(index, value)
+                engine.trail.append((index, ASSIGNED))
+                stats.propagated_cells += 1
+                if TRACER.level >= TRACE_FULL:
+                    TRACER.record("Propagation fixed {} to {}", divmod(index, puzzle.size), value)
+                keep = ~(1 << value)
+                for other in puzzle.peers[index]:
+                    if values[other] == 0 and not restrict(other, keep):
+                        return False
+                for other, dot in puzzle.dot_neighbours[index]:
+                    if values[other] == 0 and not restrict(other, dot_masks[dot][value]):
+                        return False
+                continue
+
+            # Arc consistency: dot neighbours keep the values supported by the domain of the cell
+            for other, dot in puzzle.dot_neighbours[index]:
+                if values[other] == 0 and not restrict(other, dot_support[dot][domain]):
                     return False
 
-    logging.info(f"Forward check successful for ({row}, {column}) with value {value}.")
-    return domains_backup
+        # Hidden singles: a value with a single possible cell in a unit goes there
+        for unit in puzzle.units:
+            placed = seen_once = seen_twice = 0
+            for index in unit:
+                if values[index] != 0:
+                    placed |= 1 << values[index]
+                else:
+                    seen_twice |= seen_once & domains[index]
+                    seen_once |= domains[index]
+            if placed | seen_once != full_mask:
+                return False
+            for value in mask_values[seen_once & ~seen_twice & ~placed]:
+                for index in unit:
+                    if values[index] == 0 and domains[index] >> value & 1:
+                        if not restrict(index, 1 << value):
+                            return False
+                        break
+
+        if not queue:
+            return True
+
+
+class NogoodStore:
+    """
+    Bounded store of learned nogoods: sets of (index, value) assignments that cannot be extended
+    to a new solution. Every nogood watches two of its assignments that are not on the board, and
+    is only checked when one of them is made: the watch then moves to another assignment that is
+    not on the board, and the nogood is broken when there is none left. Watches stay valid when
+    the search backtracks, so they never have to be undone.
+    When the store is full, the least recently used nogood is evicted.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.nogoods = collections.OrderedDict()
+        self.watches = {}
 
+    def add(self, assignments):
+        """
+        Learn a nogood, all of its assignments being on the board
+        :param assignments: iterable of (index, value) pairs
+        :return: True if the nogood is new
+        """
+        assignments = tuple(sorted(set(assignments)))
+        if not assignments or assignments in self.nogoods:
+            return False
+        # Every entry is [assignments, first watch, second watch], the second watch is None for a single assignment
+        entry = [assignments, assignments[0], assignments[-1] if len(assignments) > 1 else None]
+        self.nogoods[assignments] = entry
+        self.watches.setdefault(entry[1], []).append(entry)
+        if entry[2] is not None:
+            self.watches.setdefault(entry[2], []).append(entry)
+        if len(self.nogoods) > self.capacity:
+            # The watch lists drop the evicted entry lazily
+            _, evicted = self.nogoods.popitem(last=False)
+            evicted[0] = None
+        return True
 
-def restore_domains(domains_backup, board_data):
+    def find(self, index, value, values):
+        """
+        Find a nogood broken by an assignment
+        :param index: flat index of the assigned cell
+        :param value: the assigned value
+        :param values: flat values of the board
+        :return: the assignments of the broken nogood, or None
+        """
+        assignment = (index, value)
+        watching = self.watches.get(assignment)
+        if not watching:
+            return None
+        watches = self.watches
+        kept = []
+        broken = None
+        for entry in watching:
+            assignments = entry[0]
+            if assignments is None:
+                continue
+            if broken is not None:
+                kept.append(entry)
+                continue
+            other = entry[2] if entry[1] == assignment else entry[1]
+            for candidate in assignments:
+                if values[candidate[0]] != candidate[1] and candidate != other:
+                    # Move the watch to an assignment that is not on the board
+                    if entry[1] == assignment:
+                        entry[1] = candidate
+                    else:
+                        entry[2] = candidate
+                    watches.setdefault(candidate, []).append(entry)
+                    break
+            else:
+                kept.append(entry)
+                if other is None or values[other[0]] == other[1]:
+                    broken = assignments
+                    self.nogoods.move_to_end(assignments)
+        watches[assignment] = kept
+        return broken
+
+
+def explain_removals(engine, reasons, index, removed, fallback):
+    """
+    Explain why values are not available to a cell with the assigned cells excluding them,
+    picking for every value the assigned cell of the shallowest decision level
+    :param engine: candidate engine of the board
+    :param reasons: conflict set of every assigned cell, as a bitmask of decision levels (0 for the givens)
+    :param index: flat index of the cell
+    :param removed: mask of the values to explain
+    :param fallback: conflict set of a value that no assigned cell excludes, which propagation removed
+    :return: conflict set as a bitmask of decision levels
+    """
+    values = engine.values
+    puzzle = engine.puzzle
+    mask_values = puzzle.mask_values
+    culprits = [fallback] * (puzzle.size + 1)
+
+    for other in puzzle.peers[index]:
+        value = values[other]
+        if value and removed >> value & 1 and reasons[other] < culprits[value]:
+            culprits[value] = reasons[other]
+
+    for other, dot in puzzle.dot_neighbours[index]:
+        other_value = values[other]
+        if other_value:
+            for value in mask_values[removed & ~puzzle.dot_masks[dot][other_value]]:
+                if reasons[other] < culprits[value]:
+                    culprits[value] = reasons[other]
+
+    conflicts = 0
+    for value in mask_values[removed]:
+        conflicts |= culprits[value]
+    return conflicts
+
+
+def failure_conflicts(engine, reasons, nogoods, index, mark, depth, consistent):
+    """
+    Record the conflict sets of an assignment and explain why it fails, for conflict-directed backjumping
+    :param engine: candidate engine of the board
+    :param reasons: conflict set of every assigned cell, updated with the cells assigned since the mark
+    :param nogoods: NogoodStore checked against the assignment, or None
+    :param index: flat index of the assigned cell
+    :param mark: length of the trail before the assignment was checked
+    :param depth: decision level of the assignment
+    :param consistent: whether forward checking and propagation kept every domain non-empty
+    :return: the conflict set of the failure, or None if the search goes on below the assignment
+    """
+    values = engine.values
+    trail = engine.trail
+    # A cell assigned by propagation depends on every decision up to its level
+    implied = (1 << (depth + 1)) - 2
+    reasons[index] = 1 << depth
+    if PROPAGATION:
+        for other, domain in trail[mark:]:
+            if domain == ASSIGNED:
+                reasons[other] = implied
+
+    if consistent:
+        nogood = nogoods.find(index, values[index], values) if nogoods is not None else None
+        if nogood is None:
+            return None
+        engine.stats.nogood_prunings += 1
+        conflicts = 0
+        for other, _ in nogood:
+            conflicts |= reasons[other]
+        return conflicts
+
+    if not (FORWARD_CHECKING or PROPAGATION):
+        return None
+    domains = engine.domains
+    for other, _ in reversed(trail[mark:]):
+        if values[other] == 0 and domains[other] == 0:
+            return explain_removals(engine, reasons, other, engine.puzzle.full_mask, implied)
+    return implied
+
+
+def restore_domains(engine, mark):
     """
     Restore domains of variables after backtracking.
-    :param domains_backup: the original domains to restore
-    :param board_data: board and dots data
+    :param engine: candidate engine of the board
+    :param mark: length of the trail before the forward check
     :return: None
     """
-    logging.info("Restoring domains after forward checking.")
-    board = board_data[0]
-    for (row, column), domain in domains_backup.items():
-        # Restore the original value of the cell
-        if domain:  # Restore only if there was a backup
-            board[row][column] = 0  # Assuming you want to clear the cell
-    logging.info("Domains restored successfully.")
+    engine.undo(mark)
 
 
-def backtrack(board_data):
+def backtrack(board_data, engine=None, puzzle=None, limits=None, solutions=None, count_limit=None, rng=None):
     """
-    Implementation of the backtracking algorithm using recurssion
+    Implementation of the backtracking algorithm with an explicit stack instead of recursion,
+    so the budgets of the search can be checked at every node
     :param board_data: board and dots data
-    :return: the result of the backtracking algorithm, false if no solution
+    :param engine: candidate engine of the board, the puzzle is solved from scratch with solve when not given
+    :param puzzle: CompiledPuzzle to reuse when building the engine, compiled from board_data when not given
+    :param limits: SearchLimits of the search, or None for an unbounded search
+    :param solutions: list collecting a copy of every solution, the search stops at the first solution when not given
+    :param count_limit: number of solutions after which the search stops when collecting them, or None for all
+    :param rng: random.Random generator of the value order, seeded with RANDOM_SEED when needed and not given
+    :return: the status of the search ("solved", "unsatisfiable" or the status of the limit that stopped it),
+        or the solution (false if no solution) when no engine is given
     """
-    logging.info("Starting backtracking algorithm.")
-    board = board_data[0]
-    if check_assignment_complete(board):
-        logging.info("Solution found!")
-        return board
-
-    MRV_index_list, remaining_values_matrix = find_board_MRV(board_data)
-
-    # Degree Heuristic needed if 2+ variables
-    if len(MRV_index_list) > 1:
-        row, column = find_board_degree_heuristic(board_data, MRV_index_list)[0]
-    else:
-        row, column = MRV_index_list[0]
+    if engine is None:
+        return solve(board_data, puzzle, limits).solution
+    stats = engine.stats
+    domains = engine.domains
+    trail = engine.trail
+    puzzle = engine.puzzle
+    size = puzzle.size
+    mask_values = puzzle.mask_values
+    forward_checking = FORWARD_CHECKING
+    cut_branches = forward_checking or PROPAGATION
+    backjumping = BACKJUMPING
+    ordered_values = VALUE_ORDER != "ascending"
+    if VALUE_ORDER == "random" and rng is None:
+        rng = random.Random(RANDOM_SEED)
+    if backjumping:
+        reasons = [0] * puzzle.cells
+        nogoods = NogoodStore(NOGOOD_LIMIT) if NOGOOD_LIMIT else None
+
+    # Every frame is [index, row, column, values, position of the next value, trail mark of the current value,
+    # conflict set], the conflict set holding the decision levels responsible for the failures below the frame
+    stack = []
+    while True:
+        # Expand a new node
+        if limits is not None:
+            status = limits.check(stats.nodes)
+            if status:
+                return status
+        stats.nodes += 1
+        if len(stack) > stats.max_depth:
+            stats.max_depth = len(stack)
+        if engine.empty_count == 0:
+            if TRACER.level >= TRACE_DECISIONS:
+                TRACER.record("Solution found!")
+            if solutions is None:
+                return "solved"
+            # When counting, a solution is recorded and the search goes on as if it were a dead end
+            solutions.append([line[:] for line in engine.board])
+            if count_limit is not None and len(solutions) >= count_limit:
+                return "solved"
+            if backjumping:
+                # No jump may skip a level above a solution
+                for depth, frame in enumerate(stack, 1):
+                    frame[6] |= (1 << depth) - 2
+        else:
+            clock = time.perf_counter()
+            row, column = select_variable(engine)
+            index = row * size + column
+            domain = domains[index]
+            conflicts = 0
+            if backjumping:
+                conflicts = explain_removals(
+                    engine, reasons, index, puzzle.full_mask & ~domain, (1 << len(stack) + 1) - 2
+                )
+            values = order_values(engine, index, domain, rng) if ordered_values else mask_values[domain]
+            stack.append([index, row, column, values, 0, None, conflicts])
+            stats.selection_time += time.perf_counter() - clock
+
+        # Try the next value of the deepest frame, popping the frames without values left
+        while stack:
+            frame = stack[-1]
+            index, row, column, values, position, mark, conflicts = frame
+
+            # If backtracking occurs restore domains
+            if mark is not None:
+                restore_domains(engine, mark)
+                engine.unassign(index)
+                stats.backtracks += 1
+                frame[5] = None
+
+            if position == len(values):
+                if TRACER.level >= TRACE_DECISIONS:
+                    TRACER.record("No value left for ({}, {}), backtracking", row, column)
+                stack.pop()
+                if backjumping and stack:
+                    # Jump back to the deepest decision responsible for the dead end, undoing the levels in between
+                    culprit = conflicts.bit_length() - 1
+                    if culprit <= 0:
+                        return "solved" if solutions else "unsatisfiable"
+                    if culprit < len(stack):
+                        stats.backjumps += 1
+                        if TRACER.level >= TRACE_DECISIONS:
+                            TRACER.record("Backjumping from level {} to level {}", len(stack) + 1, culprit)
+                    while len(stack) > culprit:
+                        skipped = stack.pop()
+                        restore_domains(engine, skipped[5])
+                        engine.unassign(skipped[0])
+                        stats.backtracks += 1
+                    if nogoods is not None:
+                        learned = nogoods.add(
+                            (stack[level - 1][0], engine.values[stack[level - 1][0]])
+                            for level in range(1, culprit + 1) if conflicts >> level & 1
+                        )
+                        stats.nogoods_learned += learned
+                    stack[-1][6] |= conflicts & ~(1 << culprit)
+                continue
+
+            value = values[position]
+            frame[4] = position + 1
+            engine.assign(index, value)
+            if TRACER.level >= TRACE_DECISIONS:
+                TRACER.record("Assign {} to ({}, {})", value, row, column)
+                if TRACER.level >= TRACE_FULL:
+                    TRACER.record("New board state:\n{}", sudoku_to_str(engine.board))
+
+            # The domains are pruned in every mode to keep the MRV buckets up to date,
+            # but only forward checking and propagation cut the branch as soon as a domain becomes empty
+            clock = time.perf_counter()
+            mark = len(trail)
+            frame[5] = mark
+            consistent = forward_check(engine, row, column, value)
+            if forward_checking:
+                stats.forward_check_prunings += len(trail) - mark
+            now = time.perf_counter()
+            stats.candidate_time += now - clock
+            if consistent and PROPAGATION:
+                consistent = propagate(engine, [other for other, _ in trail[mark:]])
+                stats.propagation_time += time.perf_counter() - now
+            if backjumping:
+                depth = len(stack)
+                failure = failure_conflicts(engine, reasons, nogoods, index, mark, depth, consistent)
+                if failure is None:
+                    break
+                frame[6] |= failure & ~(1 << depth)
+            elif consistent or not cut_branches:
+                break
+        else:
+            return "solved" if solutions else "unsatisfiable"
+
+
+def luby(run):
+    """
+    Find a term of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    :param run: position of the term, from 1
+    :return: the term
+    """
+    while True:
+        length = 1
+        while length < run:
+            length = length * 2 + 1
+        # The last run of a block of length 2^k - 1 gets 2^(k-1), the runs before it repeat the sequence
+        if length == run:
+            return (length + 1) // 2
+        run -= length // 2
 
-    domain = remaining_values_matrix[row][column]
 
-    if (not FORWARD_CHECKING):
-        for value in domain:
-            board[row][column] = value
-            result = backtrack(board_data)
-            if result:
-                return result
-            board[row][column] = 0
+def restart_search(board_data, engine, limits=None, rng=None):
+    """
+    Run the backtracking search with restarts: every run gets a node budget of RESTART_UNIT times the next
+    term of the Luby sequence, and a run that uses it up starts over from the root with the next values of
+    the random generator, so a bad early choice cannot hold the whole search
+    :param board_data: board and dots data
+    :param engine: candidate engine of the board after the initial propagation
+    :param limits: SearchLimits of the whole search, or None for an unbounded search
+    :param rng: random.Random generator of the value order
+    :return: the status of the last run
+    """
+    stats = engine.stats
+    root = [line[:] for line in engine.board]
+    node_limit = limits.node_limit if limits is not None else None
+    deadline = limits.deadline if limits is not None else None
+    cancel_token = limits.cancel_token if limits is not None else None
+    run = 1
+    while True:
+        budget = stats.nodes + luby(run) * RESTART_UNIT
+        run_limits = SearchLimits(budget if node_limit is None else min(budget, node_limit), deadline, cancel_token)
+        status = backtrack(board_data, engine, limits=run_limits, rng=rng)
+        if status != "node_limit" or (node_limit is not None and stats.nodes >= node_limit):
+            return status
+
+        stats.restarts += 1
+        if TRACER.level >= TRACE_DECISIONS:
+            TRACER.record("Restart {} after {} nodes", stats.restarts, stats.nodes)
+        for line, root_line in zip(engine.board, root):
+            line[:] = root_line
+        engine = CandidateEngine(board_data, engine.puzzle, stats)
+        if PROPAGATION:
+            propagate(engine, range(engine.puzzle.cells))
+        run += 1
+
+
+def solve(board_data, puzzle=None, limits=None, count_limit=None):
+    """
+    Solve a puzzle with the current solver settings, through SOLUTION_CACHE when it is set and the
+    solutions are not counted
+    :param board_data: board and dots data, the board is filled in place when the puzzle is solved
+        and left with its givens otherwise
+    :param puzzle: CompiledPuzzle to reuse, compiled from board_data when not given
+    :param limits: SearchLimits of the search, or None for an unbounded search
+    :param count_limit: when given, keep searching after the first solution and count the solutions
+        up to this number (2 is enough to check that the solution is unique)
+    :return: a SolveResult with the solution and the statistics of the search
+    """
+    if SOLUTION_CACHE is not None and count_limit is None:
+        return SOLUTION_CACHE.solve(board_data, puzzle, limits)
+    return solve_uncached(board_data, puzzle, limits, count_limit)
 
-    else:
-        for value in domain:
-            prev_board = copy.deepcopy(board)   # Just for debugging, can comment out later
-            board[row][column] = value
-            logging.info(f"New board state:\n{sudoku_to_str(board)}")   # Just for debugging, can comment out later
-            log_board_differences(prev_board, board)    # Just for debugging, can comment out later
 
-            domains_backup = forward_check(board_data, row, column, value)
-            if domains_backup is not False:
-                result = backtrack(board_data)
-                if result:
-                    return result
+def solve_uncached(board_data, puzzle=None, limits=None, count_limit=None):
+    """
+    Search for the solution of a puzzle, propagating the givens first when PROPAGATION is set.
+    The puzzle is handed over to dlx_solver when ENGINE is "dlx"
+    :param board_data: board and dots data, the board is filled in place when the puzzle is solved
+        and left with its givens otherwise
+    :param puzzle: CompiledPuzzle to reuse, compiled from board_data when not given
+    :param limits: SearchLimits of the search, or None for an unbounded search
+    :param count_limit: when given, keep searching after the first solution and count the solutions
+        up to this number (2 is enough to check that the solution is unique)
+    :return: a SolveResult with the solution and the statistics of the search
+    """
+    if ENGINE == "dlx":
+        import dlx_solver
+        return dlx_solver.solve(board_data, puzzle, limits, count_limit)
+
+    stats = SearchStats()
+    start = time.perf_counter()
+    givens = [line[:] for line in board_data[0]]
+    engine = CandidateEngine(board_data, puzzle, stats)
+    clock = time.perf_counter()
+    stats.candidate_time += clock - start
+
+    consistent = engine.givens_consistent
+    if consistent and PROPAGATION:
+        consistent = propagate(engine, range(engine.puzzle.cells))
+        stats.propagated_cells_before_search = stats.propagated_cells
+        stats.propagation_time += time.perf_counter() - clock
+
+    solutions = [] if count_limit is not None else None
+    # The random order and the tie breaks of the restarts draw from one generator per puzzle, seeded with RANDOM_SEED
+    rng = None
+    if VALUE_ORDER == "random" or (RESTART_UNIT and VALUE_ORDER != "ascending"):
+        rng = random.Random(RANDOM_SEED)
+    status = "unsatisfiable"
+    if consistent and RESTART_UNIT and solutions is None:
+        status = restart_search(board_data, engine, limits, rng)
+    elif consistent:
+        status = backtrack(
+            board_data, engine, limits=limits, solutions=solutions, count_limit=count_limit, rng=rng
+        )
+    result = SolveResult(status, engine.board if status == "solved" else False, stats, solutions=solutions)
+    if status != "solved":
+        if status != "unsatisfiable":
+            if TRACER.level >= TRACE_DECISIONS:
+                TRACER.record("Search stopped: {} after {} nodes", status, stats.nodes)
+            result.partial = [line[:] for line in engine.board]
+        # Give the board back with only its givens
+        for line, given_line in zip(engine.board, givens):
+            line[:] = given_line
+    if solutions:
+        # The counting search ends on another state, the board is filled with the first solution found
+        for line, solution_line in zip(engine.board, solutions[0]):
+            line[:] = solution_line
+        result.solution = engine.board
+    stats.total_time = time.perf_counter() - start
+    return result
+
+
+def check_solution(board_data, solution, negative_constraint=None):
+    """
+    Check that a solution keeps the givens and satisfies every rule of the puzzle
+    :param board_data: givens and dots information
+    :param solution: the solved board
+    :param negative_constraint: whether to check the negative constraint, NEGATIVE_CONSTRAINT when not given
+    :return: boolean of whether the solution is valid
+    """
+    puzzle = compile_puzzle(board_data, negative_constraint)
+    values = [value for line in solution for value in line]
+    givens = [value for line in board_data[0] for value in line]
+    if len(values) != puzzle.cells:
+        return False
+
+    for given, value in zip(givens, values):
+        if given != 0 and given != value:
+            return False
 
-                # If backtracking occurs restore domains
-                restore_domains(domains_backup, board_data)
+    for unit in puzzle.units:
+        if sorted(values[index] for index in unit) != list(puzzle.digits):
+            return False
 
-            board[row][column] = 0
+    for index, other, dot in puzzle.dot_edges:
+        if not puzzle.dot_masks[dot][values[index]] >> values[other] & 1:
+            return False
 
-    logging.warning("No solution found during backtracking.")
-    return False
+    return True
 
 
 def process_output(file_path, result):
@@ -474,12 +1321,8 @@ def process_output(file_path, result):
     :param result: the result produced by the algorithm
     :return: None
     """
-    logging.info(f"Processing output file: {file_path}")
-    file = open(file_path, "w")
-    for line in result:
-        for elem in line:
-            print(elem, end=" ", file=file)
-        print(file=file)
+    with open(file_path, "w") as file:
+        file.write("".join("".join(f"{elem} " for elem in line) + "\n" for line in result))
 
 
 def sudoku_to_str(matrix):
@@ -501,6 +1344,15 @@ def main():
     """
     Main method to process the input file and solve the puzzle.
     """
+    if sys.argv[1:2] == ["batch"]:
+        import batch_solver
+        batch_solver.main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["generate"]:
+        import puzzle_generator
+        puzzle_generator.main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description='Solve a Kropki Sudoku puzzle.')
     parser.add_argument("input_file", type=str, help="Input file from the Inputs folder")
     parser.add_argument(
@@ -509,17 +1361,124 @@ def main():
     parser.add_argument(
         "-fc", "--forward-checking", action="store_true", help="Enable forward checking in the solving algorithm"
     )
+    parser.add_argument(
+        "-p", "--propagation", action="store_true",
+        help="Enable constraint propagation (dot arc consistency, naked and hidden singles) before and during search"
+    )
+    parser.add_argument(
+        "-b", "--backjumping", action="store_true",
+        help="Enable conflict-directed backjumping: jump back to the deepest decision responsible for a dead end"
+    )
+    parser.add_argument(
+        "--nogoods", type=int, default=0,
+        help="With backjumping, keep up to this many learned nogoods, evicting the least recently used ones"
+    )
+    parser.add_argument(
+        "--value-order", choices=VALUE_ORDERS, default="ascending",
+        help="Order of the values tried in a cell: ascending, lcv (least constraining value first), "
+             "dot (most compatible dot neighbours first) or random"
+    )
+    parser.add_argument(
+        "--seed", type=int, help="Seed of the random value order and of the tie breaks of the restarts"
+    )
+    parser.add_argument(
+        "--restarts", type=int, default=0,
+        help="Restart the search after this many nodes times the Luby sequence (1, 1, 2, 1, 1, 2, 4, ...), "
+             "with a value order other than ascending"
+    )
+    parser.add_argument(
+        "-n", "--negative-constraint", action="store_true",
+        help="Enforce the negative constraint: adjacent cells without a dot are neither consecutive nor in a 1:2 ratio"
+    )
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="backtracking",
+        help="Search engine: backtracking with MRV and degree heuristics, or dlx for exact cover with dancing links"
+    )
+    parser.add_argument(
+        "--node-limit", type=int, help="Stop the search after this many nodes and report the partial board"
+    )
+    parser.add_argument(
+        "--time-limit", type=float, help="Stop the search after this many seconds and report the partial board"
+    )
+    parser.add_argument(
+        "--count", type=int, help="Keep searching after the first solution and count the solutions up to this number"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int,
+        help="Split the top of the search tree into subproblems solved on this many processes (0 for every core)"
+    )
+    parser.add_argument(
+        "--unique", action="store_true", help="Check that the puzzle has exactly one solution (same as --count 2)"
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="Print the statistics of the search as JSON"
+    )
+    parser.add_argument(
+        "--cache", type=str,
+        help="SQLite file of solved puzzles, looked up under every rotation and reflection before searching"
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=100000,
+        help="Number of puzzles kept in the cache, the least recently used ones are evicted first"
+    )
+    parser.add_argument(
+        "--trace", choices=TRACE_LEVELS, default="off",
+        help="Record search events: 'decisions' for assignments and backtracks, 'full' for every search step"
+    )
+    parser.add_argument(
+        "--trace-size", type=int, default=100000, help="Number of search events kept in the trace buffer"
+    )
+    parser.add_argument(
+        "--trace-file", type=str,
+        help="Name of the trace log to be saved in the Logs folder (by default the trace is only saved on failure)"
+    )
     args = parser.parse_args()
 
-    global FORWARD_CHECKING
-    FORWARD_CHECKING = args.forward_checking
+    if args.nogoods and not args.backjumping:
+        parser.error("--nogoods requires -b/--backjumping")
+    if args.restarts and args.value_order == "ascending":
+        parser.error("--restarts requires a --value-order other than ascending, every run would be the same")
 
-    if FORWARD_CHECKING:
-        print(f"Solving with forward checking...")
-        logging.info(f"Solving with forward checking...")
+    global VALUE_ORDER, RANDOM_SEED, RESTART_UNIT
+
+    global FORWARD_CHECKING, PROPAGATION, BACKJUMPING, NOGOOD_LIMIT, NEGATIVE_CONSTRAINT, ENGINE, TRACER, SOLUTION_CACHE
+    FORWARD_CHECKING = args.forward_checking
+    PROPAGATION = args.propagation
+    BACKJUMPING = args.backjumping
+    NOGOOD_LIMIT = args.nogoods
+    VALUE_ORDER = args.value_order
+    RANDOM_SEED = args.seed
+    RESTART_UNIT = args.restarts
+    NEGATIVE_CONSTRAINT = args.negative_constraint
+    ENGINE = args.engine
+    TRACER = SearchTracer(TRACE_LEVELS.index(args.trace), args.trace_size)
+    if args.cache:
+        import solution_cache
+        SOLUTION_CACHE = solution_cache.SolutionCache(args.cache, args.cache_size)
+
+    modes = []
+    if ENGINE == "dlx":
+        modes.append("Solving with dancing links...")
+    elif FORWARD_CHECKING:
+        modes.append("Solving with forward checking...")
     else:
-        print(f"Solving without forward checking...")
-        logging.info(f"Solving without forward checking...")
+        modes.append("Solving without forward checking...")
+    if PROPAGATION:
+        modes.append("Solving with constraint propagation...")
+    if BACKJUMPING and ENGINE != "dlx":
+        modes.append("Solving with conflict-directed backjumping...")
+        if NOGOOD_LIMIT:
+            modes.append(f"Learning up to {NOGOOD_LIMIT} nogoods...")
+    if VALUE_ORDER != "ascending" and ENGINE != "dlx":
+        modes.append(f"Ordering values by {VALUE_ORDER}...")
+        if RESTART_UNIT:
+            modes.append(f"Restarting after Luby budgets of {RESTART_UNIT} nodes...")
+    if NEGATIVE_CONSTRAINT:
+        modes.append("Enforcing the negative constraint...")
+    for mode in modes:
+        print(mode)
+        if TRACER.level >= TRACE_DECISIONS:
+            TRACER.record(mode)
 
     input_path = os.path.join("Inputs", args.input_file)
 
@@ -530,27 +1489,82 @@ def main():
         output_path = os.path.join("Outputs", f"{timestamp}__Output.txt")
 
     start = time.time()
-    board_data = process_input(input_path)
+    try:
+        board_data = process_input(input_path)
+        puzzle = compile_puzzle(board_data) if board_data else None
+    except ValueError as error:
+        print(f"Could not process input file '{args.input_file}': {error}")
+        return
     if not board_data:
-        logging.error(f"Could not process input file '{args.input_file}'")
         print(f"Could not process input file '{args.input_file}'")
         return
 
-    logging.info(f"Initial board state:\n{sudoku_to_str(board_data[0])}")
-    
-    result = backtrack(board_data)
-    if not result:
-        print("No solution found.")
-    else:
-        logging.info(f"Final board state:\n{sudoku_to_str(result)}")
-        process_output(output_path, result)
-        print("Solution found!")
-        print(f"\n{sudoku_to_str(result)}\n")
-        print(f"Solution saved to '{output_path}'")
-    
+    if TRACER.level >= TRACE_DECISIONS:
+        TRACER.record("Initial board state:\n{}", sudoku_to_str(board_data[0]))
+    givens = copy.deepcopy(board_data[0])
+
+    solved = False
+    try:
+        limits = None
+        if args.node_limit is not None or args.time_limit is not None:
+            limits = SearchLimits.from_time_limit(args.node_limit, args.time_limit)
+        count_limit = 2 if args.unique and not args.count else args.count
+        if args.jobs is not None:
+            import parallel_solver
+            solve_result = parallel_solver.solve(board_data, puzzle, limits, count_limit, args.jobs or None)
+        else:
+            solve_result = solve(board_data, puzzle, limits, count_limit)
+        result = solve_result.solution
+        stats = solve_result.stats
+        if PROPAGATION:
+            print(f"Constraint propagation fixed {stats.propagated_cells_before_search} cells before search")
+            print(f"Constraint propagation fixed {stats.propagated_cells} cells without branching in total")
+        if args.stats:
+            print(json.dumps(dict(status=solve_result.status, **stats.to_dict()), indent=2))
+        if count_limit:
+            count = solve_result.solution_count
+            if solve_result.status != "solved" and solve_result.status != "unsatisfiable":
+                print(f"Found {count} solutions before the search stopped")
+            elif count >= count_limit:
+                print(f"Found at least {count} solutions (count limit reached)")
+            else:
+                print(f"Found exactly {count} solutions")
+            if args.unique:
+                print("The solution is unique." if solve_result.is_unique() else "The solution is not proven unique.")
+        if solve_result.partial:
+            print(f"Search stopped ({solve_result.status}) after {stats.nodes} nodes, partial board:")
+            print(f"\n{sudoku_to_str(solve_result.partial)}\n")
+        elif not result and solve_result.status != "unsatisfiable":
+            print(f"Search stopped ({solve_result.status}) after {stats.nodes} nodes.")
+        elif not result:
+            print("No solution found.")
+        elif not check_solution((givens, board_data[1], board_data[2]), result):
+            if TRACER.level >= TRACE_DECISIONS:
+                TRACER.record("Invalid solution found:\n{}", sudoku_to_str(result))
+            print("Invalid solution found.")
+        else:
+            solved = True
+            if TRACER.level >= TRACE_DECISIONS:
+                TRACER.record("Final board state:\n{}", sudoku_to_str(result))
+            process_output(output_path, result)
+            print("Solution found!")
+            print(f"\n{sudoku_to_str(result)}\n")
+            print(f"Solution saved to '{output_path}'")
+    finally:
+        if SOLUTION_CACHE is not None:
+            counters = SOLUTION_CACHE.counters()
+            print(
+                f"Solution cache: {counters['hits']} hits, {counters['misses']} misses, "
+                f"{counters['size']} puzzles stored"
+            )
+            SOLUTION_CACHE.close()
+        # The trace is only written out on request or when the search failed
+        if TRACER.level != TRACE_OFF and (args.trace_file or not solved):
+            trace_path = os.path.join(LOG_FOLDER, args.trace_file) if args.trace_file else None
+            print(f"Trace saved to '{TRACER.dump(trace_path)}'")
+
     end = time.time()
     print(f"Total time taken: {round(end - start, 2)} seconds")
-    logging.info(f"Total time taken: {round(end - start, 2)} seconds")
 
 
 if __name__ == "__main__":
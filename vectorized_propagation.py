@@ -0,0 +1,176 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import sudoku_solver
+
+
+# Number of boards propagated together, which bounds the size of the (boards, units, cells, values) arrays
+CHUNK_SIZE = 2048
+
+# Dot type of the neighbour slots of a cell without a neighbour, or of a neighbour without any rule
+UNCONSTRAINED = 3
+
+# Neighbour slots of every cell: left, right, up and down
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+def available():
+    """
+    :return: whether NumPy is installed, which the vectorized propagation needs
+    """
+    return np is not None
+
+
+class BoardLayout:
+    """
+    Tables of a grid size shared by every board of a batch, as NumPy arrays:
+    the cells of every unit, the units of every cell, the neighbour of every cell in each direction
+    and the dot support masks, with an extra row for the unconstrained neighbours
+    """
+
+    def __init__(self, size):
+        empty = sudoku_solver.CompiledPuzzle(
+            [[0] * (size - 1) for _ in range(size)], [[0] * size for _ in range(size - 1)]
+        )
+        self.size = size
+        self.cells = empty.cells
+        self.units = np.array(empty.units)
+        self.cell_units = np.array([
+            (empty.rows[index], size + empty.columns[index], 2 * size + empty.boxes[index])
+            for index in range(empty.cells)
+        ])
+        self.shifts = np.arange(1, size + 1, dtype=np.int32)
+        self.weights = (1 << self.shifts).astype(np.int64)
+
+        # A missing neighbour points at the cell itself, its slot is always unconstrained
+        neighbours = []
+        for row_step, column_step in DIRECTIONS:
+            direction = []
+            for index in range(empty.cells):
+                row, column = divmod(index, size)
+                if 0 <= row + row_step < size and 0 <= column + column_step < size:
+                    direction.append((row + row_step) * size + column + column_step)
+                else:
+                    direction.append(index)
+            neighbours.append(direction)
+        self.neighbours = np.array(neighbours)
+
+        full_support = [empty.full_mask if mask else 0 for mask in range(empty.full_mask + 1)]
+        self.support = np.array(list(empty.dot_support) + [full_support], dtype=np.int32)
+
+
+_LAYOUTS = {}
+
+
+def board_layout(size):
+    """
+    Find the BoardLayout of a grid size, building it on first use
+    """
+    if size not in _LAYOUTS:
+        _LAYOUTS[size] = BoardLayout(size)
+    return _LAYOUTS[size]
+
+
+def dot_types(layout, horizontal_dots, vertical_dots, negative_constraint):
+    """
+    Find the dot type of every neighbour slot of every cell of a batch
+    :param layout: BoardLayout of the grid size
+    :param horizontal_dots: (boards, size, size - 1) array of the horizontal dots
+    :param vertical_dots: (boards, size - 1, size) array of the vertical dots
+    :param negative_constraint: whether adjacent cells without a dot are neither consecutive nor in a 1:2 ratio
+    :return: (boards, 4, cells) array of dot types, UNCONSTRAINED for no rule
+    """
+    size = layout.size
+    boards = horizontal_dots.shape[0]
+    types = np.full((boards, 4, size, size), UNCONSTRAINED, dtype=np.intp)
+    types[:, 0, :, 1:] = horizontal_dots
+    types[:, 1, :, :-1] = horizontal_dots
+    types[:, 2, 1:, :] = vertical_dots
+    types[:, 3, :-1, :] = vertical_dots
+    if not negative_constraint:
+        types[types == 0] = UNCONSTRAINED
+    return types.reshape(boards, 4, layout.cells)
+
+
+def propagate_domains(layout, domains, types):
+    """
+    Propagate a batch of boards until none changes anymore: arc consistency on the dots, naked singles
+    (elimination of the assigned values from their rows, columns and boxes) and hidden singles,
+    each step as array operations over every board at once
+    :param layout: BoardLayout of the grid size
+    :param domains: (boards, cells) array of candidate masks, bit v set when the value v is possible, updated in place
+    :param types: (boards, 4, cells) array of dot types from dot_types
+    :return: (boards,) boolean array of the boards found to be unsatisfiable
+    """
+    boards = domains.shape[0]
+    failed = np.zeros(boards, dtype=bool)
+    units = layout.units
+    cell_units = layout.cell_units
+
+    while True:
+        previous = domains.copy()
+
+        for direction in range(4):
+            domains &= layout.support[types[:, direction], domains[:, layout.neighbours[direction]]]
+
+        bits = (domains[:, :, None] >> layout.shifts) & 1
+        single = bits.sum(axis=2) == 1
+        assigned = (bits * single[:, :, None])[:, units].sum(axis=2)
+        failed |= (assigned > 1).any(axis=(1, 2))
+        used = (assigned > 0).astype(np.int64) @ layout.weights
+        peers_used = np.bitwise_or.reduce(used[:, cell_units], axis=2).astype(np.int32)
+        domains[:] = np.where(single, domains, domains & ~peers_used)
+
+        bits = (domains[:, :, None] >> layout.shifts) & 1
+        candidates = bits[:, units].sum(axis=2)
+        failed |= (candidates == 0).any(axis=(1, 2))
+        hidden = (candidates == 1).astype(np.int64) @ layout.weights
+        cell_hidden = np.bitwise_or.reduce(hidden[:, cell_units], axis=2).astype(np.int32)
+        restricted = domains & cell_hidden
+        # A cell holding the only place of two values in its units cannot take both
+        failed |= (restricted & (restricted - 1) != 0).any(axis=1)
+        domains[:] = np.where(restricted != 0, restricted, domains)
+        failed |= (domains == 0).any(axis=1)
+
+        # Failed boards are frozen, their domains no longer mean anything
+        domains[failed] = previous[failed]
+        if np.array_equal(domains, previous):
+            return failed
+
+
+def propagate_boards(boards_data, negative_constraint=False):
+    """
+    Propagate the givens of many boards of the same size together
+    :param boards_data: list of (board, horizontal_dots, vertical_dots) tuples of the same grid size
+    :param negative_constraint: whether to enforce the negative constraint
+    :return: list of (status, board) tuples in input order: "solved" with the solved board, "unsatisfiable"
+        with the givens, or "open" with the givens and the cells fixed by propagation, still to be searched
+    """
+    size = len(boards_data[0][0])
+    layout = board_layout(size)
+    full_mask = sudoku_solver.value_tables(size).full_mask
+    results = []
+
+    for start in range(0, len(boards_data), CHUNK_SIZE):
+        chunk = boards_data[start:start + CHUNK_SIZE]
+        values = np.array([board for board, _, _ in chunk], dtype=np.int32).reshape(len(chunk), layout.cells)
+        domains = np.where(values > 0, np.left_shift(1, values), full_mask).astype(np.int32)
+        types = dot_types(
+            layout,
+            np.array([horizontal_dots for _, horizontal_dots, _ in chunk], dtype=np.intp),
+            np.array([vertical_dots for _, _, vertical_dots in chunk], dtype=np.intp),
+            negative_constraint,
+        )
+        failed = propagate_domains(layout, domains, types)
+
+        single = (domains & (domains - 1)) == 0
+        fixed = np.where(single, np.log2(np.maximum(domains, 1)).astype(np.int32), 0)
+        for number, board_data in enumerate(chunk):
+            if failed[number]:
+                results.append(("unsatisfiable", [line[:] for line in board_data[0]]))
+                continue
+            board = fixed[number].reshape(size, size).tolist()
+            results.append(("solved" if single[number].all() else "open", board))
+    return results